@@ -0,0 +1,142 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    Headless batch analysis of files, the command line counterpart
+    of "Engine". It takes globs or directories, computes the same
+    Value, Differential and Integrate series as the GUI for each
+    file in a process pool, and writes the series of every file to
+    a compressed .npz together with a summary.json holding the
+    statistics of all files.
+
+    Neither PyQt5 nor pyqtgraph is imported by this module, so it
+    can run on machines without a display, such as CI servers.
+
+    Usage:
+        python batch.py dumps/ 'firmware/*.bin' -o results -j 8
+'''
+
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fileLoader import loading, WordFormat
+from config import CongfigManager
+from compute import cal_differential, cal_integrate
+
+Names = ['Value', 'Differential', 'Integrate']
+
+def collect_files(patterns):
+    '''
+        Expand globs and directories (recursively) to a sorted list of files.
+    '''
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                files.update(os.path.join(root, name) for name in names)
+        else:
+            files.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    return sorted(files)
+
+def summarize(vals):
+    return {
+        'length': int(len(vals)),
+        'min': vals.min().item(),
+        'max': vals.max().item(),
+        'mean': float(vals.mean(dtype=np.float64)),
+        'std': float(vals.std(dtype=np.float64)),
+    }
+
+def analyze(path, outPath, maxSize, mmap, fmt):
+    '''
+        Analyze one file and save the series, run in a worker process.
+        Returns the summary of the file, errors are recorded in it so that
+        a failed file never stops the batch.
+    '''
+    summary = {'path': path}
+    try:
+        vals = loading(path, maxSize, mmap=mmap, fmt=fmt)
+        series = [vals, cal_differential(vals), cal_integrate(vals)]
+        np.savez_compressed(outPath, **{name: s for name, s in zip(Names, series)})
+        summary['output'] = outPath
+        for name, s in zip(Names, series):
+            summary[name] = summarize(s)
+    # unreadable files, memory errors and bad contents alike
+    except Exception as exc:
+        summary['error'] = str(exc) or type(exc).__name__
+    return summary
+
+def output_paths(files, outDir):
+    '''
+        Name the outputs after the input files, a counter is appended to
+        duplicated names.
+    '''
+    paths = []
+    used = {}
+    for path in files:
+        name = os.path.basename(path)
+        cnt = used.get(name, 0)
+        used[name] = cnt + 1
+        if cnt:
+            name = '%s_%d' % (name, cnt)
+        paths.append(os.path.join(outDir, name + '.npz'))
+    return paths
+
+def main(argv=None):
+    cfg = CongfigManager()
+
+    parser = argparse.ArgumentParser(description='Batch analysis of binary files without GUI.')
+    parser.add_argument('inputs', nargs='+', help='files, globs or directories to analyze')
+    parser.add_argument('-o', '--output', default='batch_output', help='output directory')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='count of worker processes')
+    parser.add_argument('--max-size', type=float, default=cfg.get('MaxFileSize'),
+                        help='size limit of files by KB when not memory-mapped')
+    mmapGroup = parser.add_mutually_exclusive_group()
+    mmapGroup.add_argument('--mmap', dest='mmap', action='store_true', help='map files into memory')
+    mmapGroup.add_argument('--no-mmap', dest='mmap', action='store_false', help='read files into memory instead of mapping')
+    parser.set_defaults(mmap=cfg.get('MemoryMapped'))
+    parser.add_argument('--word-type', choices=list(WordFormat.Kinds), default=cfg.get('WordType'))
+    parser.add_argument('--word-bits', type=int, default=cfg.get('WordBits'))
+    parser.add_argument('--byte-order', choices=list(WordFormat.Orders), default=cfg.get('ByteOrder'))
+    parser.add_argument('--offset', type=int, default=cfg.get('WordOffset'), help='bytes skipped at the beginning')
+    parser.add_argument('--stride', type=int, default=cfg.get('WordStride'), help='bytes between words, 0 for packed')
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.inputs)
+    if not files:
+        print('no file matched', file=sys.stderr)
+        return 1
+
+    os.makedirs(args.output, exist_ok=True)
+    outPaths = output_paths(files, args.output)
+    try:
+        fmt = WordFormat(args.word_type, args.word_bits, args.byte_order, args.offset, args.stride)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    summaries = []
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(analyze, path, outPath, args.max_size, args.mmap, fmt)
+                   for path, outPath in zip(files, outPaths)]
+        for path, future in zip(files, futures):
+            # a worker process may die (such as killed for memory)
+            try:
+                summary = future.result()
+            except Exception as exc:
+                summary = {'path': path, 'error': str(exc) or type(exc).__name__}
+            summaries.append(summary)
+            print('%s: %s' % (summary['path'], summary.get('error', 'ok')))
+
+    with open(os.path.join(args.output, 'summary.json'), 'w') as f:
+        json.dump(summaries, f, indent=2, ensure_ascii=False)
+
+    failed = sum('error' in s for s in summaries)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    Benchmark of the loading and plotting pipeline over synthetic files
+    from KBs to GBs. For each size, a random binary file is generated and
+    the stages are timed in a fresh process (so that the peak RSS belongs
+    to that size only):
+    - read: fileLoader.loading (reading bytes, or mapping them)
+    - decode: first full pass over the decoded words
+    - differential / integrate: compute.cal_differential / cal_integrate
+    - integrate_parallel: compute.cal_integrate_parallel, its speedup
+      against "integrate" is reported as well
+    - chunked: compute.cal_chunked, which replaces the three stages above
+      for mapped files of "OutOfCoreSize" MB or more, like "Engine"
+    - stats: slidingStats.sliding_stats, written to scratch files when
+      computed out of core
+    - pyramid: decimation.MinMaxPyramid of all series
+    - set_data: MainWindow.load_datas
+    - first_paint: painting the plot widgets
+
+    Scratch files are made in the directory of the generated files and
+    removed once mapped. The peak RSS counts the pages of mapped files
+    (the input and the scratch files) which the kernel can write back and
+    reclaim, so the peak of the memory allocated (by tracemalloc, which
+    NumPy reports to) is given as well. The scratch files of 16 bits words
+    take about 8 times the file size on disk. The GUI runs on the offscreen Qt platform.
+    Results are printed (or saved) as JSON together with the git commit,
+    and a former result can be given as baseline to print the ratio of
+    each stage.
+
+    Usage:
+        python benchmarks/pipeline.py --sizes 1K,1M,100M,2G --mmap -o bench.json
+        python benchmarks/pipeline.py --sizes 1K,1M --baseline bench.json
+        python benchmarks/pipeline.py --sizes 256M,1G --threads 8 --no-gui
+'''
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+RootDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RootDir)
+
+Units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+GenChunk = 1 << 26          # bytes generated per chunk
+
+def parse_size(text):
+    text = text.strip().upper()
+    if text[-1] in Units:
+        return int(float(text[:-1]) * Units[text[-1]])
+    return int(text)
+
+def generate(path, size):
+    import numpy as np
+    rng = np.random.default_rng(0)
+    with open(path, 'wb') as f:
+        for c0 in range(0, size, GenChunk):
+            f.write(rng.integers(0, 256, min(GenChunk, size - c0), dtype=np.uint8).tobytes())
+
+def peak_rss():
+    # ru_maxrss is by KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class Timer:
+    def __init__(self):
+        self.Stages = {}
+
+    def stage(self, name, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.Stages[name] = time.perf_counter() - start
+        return result
+
+def scratch_path(directory):
+    fd, path = tempfile.mkstemp(suffix='.npy', prefix='bench-', dir=directory)
+    os.close(fd)
+    return path
+
+def run_child(path, mmap, gui, threads):
+    '''
+        Run the pipeline over one file in this process and return the timings.
+        Mapped files of "OutOfCoreSize" MB or more are computed out of core as
+        "Engine.compute_datas" does.
+    '''
+    from numpy.lib.format import open_memmap
+    from fileLoader import loading
+    from compute import cal_differential, cal_integrate, cal_integrate_parallel, cal_chunked
+    from slidingStats import sliding_stats, window_count
+    from decimation import MinMaxPyramid
+    from config import CongfigManager
+
+    tracemalloc.start()
+    cfg = CongfigManager()
+    statsWindow, statsStep = cfg.get('StatsWindow'), cfg.get('StatsStep')
+    timer = Timer()
+    vals = timer.stage('read', loading, path, float('inf'), mmap=mmap)
+    timer.stage('decode', vals.min)
+    datas = {'Value': vals}
+    outOfCore = mmap and vals.nbytes >= cfg.get('OutOfCoreSize') * 1024 * 1024
+    directory = os.path.dirname(path)
+    speedup = None
+
+    if outOfCore:
+        paths = [scratch_path(directory), scratch_path(directory)]
+        try:
+            datas['Differential'], datas['Integrate'] = timer.stage('chunked', cal_chunked, vals, *paths)
+        finally:
+            for p in paths:
+                os.remove(p)
+
+        paths = [scratch_path(directory) for _ in range(3)]
+        try:
+            nwin = window_count(len(vals), statsWindow, statsStep)
+            out = {name: open_memmap(p, mode='w+', dtype='f8', shape=(nwin,))
+                   for name, p in zip(('Entropy', 'Mean', 'Variance'), paths)}
+            datas.update(timer.stage('stats', sliding_stats, vals, statsWindow, statsStep, out))
+        finally:
+            for p in paths:
+                os.remove(p)
+    else:
+        datas['Differential'] = timer.stage('differential', cal_differential, vals)
+        # the serial result is freed before the parallel one, which is kept like "Engine"
+        timer.stage('integrate', cal_integrate, vals)
+        datas['Integrate'] = timer.stage('integrate_parallel', cal_integrate_parallel, vals, threads=threads)
+        speedup = timer.Stages['integrate'] / max(timer.Stages['integrate_parallel'], 1e-9)
+        datas.update(timer.stage('stats', sliding_stats, vals, statsWindow, statsStep))
+
+    def build_pyramids():
+        return {name: MinMaxPyramid(d, xStep=statsStep if name in ('Entropy', 'Mean', 'Variance') else 1)
+                for name, d in datas.items()}
+    pyramids = timer.stage('pyramid', build_pyramids)
+
+    if gui:
+        from PyQt5 import QtWidgets as widgets
+        app = widgets.QApplication([])
+        from window import MainWindow
+
+        window = MainWindow('Benchmark', list(datas), cfg.readConfig, {}, lambda path: None)
+        timer.stage('set_data', window.load_datas, datas, pyramids)
+
+        def paint():
+            for plotWidget in window.PlotWidgets.values():
+                if not plotWidget.isHidden():
+                    plotWidget.grab()
+        timer.stage('first_paint', paint)
+
+    return {'stages': timer.Stages, 'integrate_speedup': speedup, 'threads': threads or os.cpu_count(),
+            'out_of_core': outOfCore, 'peak_rss': peak_rss(),
+            'peak_heap': tracemalloc.get_traced_memory()[1], 'samples': len(vals)}
+
+def run_size(size, directory, mmap, gui, threads):
+    path = os.path.join(directory, 'bench_%d.bin' % size)
+    generate(path, size)
+    try:
+        env = dict(os.environ)
+        env['QT_QPA_PLATFORM'] = 'offscreen'
+        cmd = [sys.executable, os.path.abspath(__file__), '--child', path]
+        cmd += ['--mmap'] if mmap else []
+        cmd += [] if gui else ['--no-gui']
+        cmd += ['--threads', str(threads)] if threads else []
+        proc = subprocess.run(cmd, env=env, cwd=RootDir, capture_output=True, text=True, check=True)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        os.remove(path)
+    result['size'] = size
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=RootDir, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_baseline(results, baselinePath):
+    with open(baselinePath) as f:
+        baseline = {r['size']: r for r in json.load(f)['results']}
+    for r in results:
+        old = baseline.get(r['size'])
+        if old is None:
+            continue
+        ratios = ['%s x%.2f' % (stage, t / old['stages'][stage])
+                  for stage, t in r['stages'].items() if old['stages'].get(stage)]
+        print('%d bytes: %s' % (r['size'], ', '.join(ratios)), file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark of loading, computing and plotting.')
+    parser.add_argument('--sizes', default='1K,1M,16M', help='comma separated sizes, such as 1K,1M,2G')
+    parser.add_argument('--mmap', action='store_true', help='map files instead of reading them')
+    parser.add_argument('--no-gui', action='store_true', help='skip set_data and first_paint')
+    parser.add_argument('--threads', type=int, default=0, help='threads of parallel integrate, 0 for all CPUs')
+    parser.add_argument('--dir', default=None, help='directory of generated files')
+    parser.add_argument('--baseline', default=None, help='former JSON result to compare with')
+    parser.add_argument('-o', '--output', default=None, help='JSON file to save the results')
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.mmap, not args.no_gui, args.threads)))
+        return
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        results = [run_size(parse_size(s), tmp, args.mmap, not args.no_gui, args.threads)
+                   for s in args.sizes.split(',')]
+
+    report = {'commit': git_commit(), 'mmap': args.mmap, 'results': results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+    if args.baseline:
+        print_baseline(results, args.baseline)
+
+if __name__ == '__main__':
+    main()
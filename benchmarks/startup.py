@@ -0,0 +1,103 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    Startup benchmark of the program, measuring:
+    1. import time of each module in a fresh interpreter
+    2. time to first plot, from the start of the interpreter to the
+       first file being plotted and painted by "Engine"
+
+    Every measurement runs in a new process so that modules cached
+    by former measurements do not hide the cost. The GUI runs on the
+    offscreen Qt platform and the file dialog is skipped by feeding a
+    generated file. Results are printed (or saved) as JSON so that
+    regressions can be compared across commits.
+
+    Usage:
+        python benchmarks/startup.py --size 1024 --repeat 5 -o startup.json
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RootDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+Modules = ['config', 'fileLoader', 'compute', 'decimation', 'batch',
+           'worker', 'windowEventHandling', 'engine', 'window']
+
+# run in a child process, prints the seconds from interpreter start to first plot
+FirstPlotScript = '''
+import sys, time
+from PyQt5 import QtWidgets as widgets
+import engine
+
+path = sys.argv[1]
+start = float(sys.argv[2])
+engine.Engine.choose_init_file = lambda self: path
+onLoaded = engine.Engine.on_loaded
+
+def on_loaded(self, result):
+    onLoaded(self, result)
+    widgets.QApplication.processEvents()
+    print(time.time() - start)
+    widgets.QApplication.quit()
+
+engine.Engine.on_loaded = on_loaded
+app = widgets.QApplication(sys.argv)
+e = engine.Engine()
+app.exec_()
+'''
+
+def child_env():
+    env = dict(os.environ)
+    env['QT_QPA_PLATFORM'] = 'offscreen'
+    env['PYTHONPATH'] = RootDir + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+def import_time(module):
+    '''
+        Cumulative import time of a module in seconds, by "-X importtime".
+    '''
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                          env=child_env(), cwd=RootDir, capture_output=True, text=True, check=True)
+    for line in reversed(proc.stderr.splitlines()):
+        fields = [f.strip() for f in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1e6
+    return None
+
+def first_plot_time(path):
+    start = time.time()
+    proc = subprocess.run([sys.executable, '-c', FirstPlotScript, path, repr(start)],
+                          env=child_env(), cwd=RootDir, capture_output=True, text=True, check=True)
+    return float(proc.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Startup benchmark.')
+    parser.add_argument('--size', type=int, default=1024, help='size of the plotted file by KB')
+    parser.add_argument('--repeat', type=int, default=3, help='count of repeats, the best one is kept')
+    parser.add_argument('-o', '--output', default=None, help='JSON file to save the results')
+    args = parser.parse_args(argv)
+
+    results = {'import': {}, 'first_plot': None, 'size_kb': args.size}
+    for module in Modules:
+        results['import'][module] = min(import_time(module) for _ in range(args.repeat))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.bin')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(args.size * 1024))
+        results['first_plot'] = min(first_plot_time(path) for _ in range(args.repeat))
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    Cache of loaded files and their derived series, so that switching
+    back to a file opened before needs no loading and computing.
+
+    Two levels are offered:
+    1. an in-process LRU cache of the decoded arrays, derived series and
+       plot pyramids, bounded by a memory budget. Only views of the loaded
+       file mapped into memory are not charged. Arrays in scratch files
+       (derived series computed out of core) and in temporary files
+       (decompressed files) are charged like memory, since the cache keeps
+       those files alive on disk.
+    2. an optional on-disk cache of the derived series in .npz files.
+
+    Entries are keyed by the path, size and modification time of the
+    file and the word format, so a modified file is never served from
+    the cache. The cache is shared by background workers and is guarded
+    by a lock.
+'''
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from fileLoader import split_member
+
+def resident_bytes(arr, path):
+    '''
+        Bytes of an array held by the cache, zero for views of the file at
+        "path" (absolute) mapped into memory.
+    '''
+    base = arr
+    while base is not None:
+        if isinstance(base, np.memmap):
+            return 0 if base.filename == path else arr.nbytes
+        base = getattr(base, 'base', None)
+    return arr.nbytes
+
+def pyramid_bytes(pyramid):
+    return sum(mins.nbytes + maxs.nbytes for _, mins, maxs in pyramid.Levels)
+
+class SeriesCache:
+
+    def __init__(self, budget, diskDir=None):
+        '''
+            :param budget: memory budget of the LRU cache by MB
+            :param diskDir: directory of the on-disk cache, None to disable it
+        '''
+        self.Budget = budget * 1024 * 1024
+        self.DiskDir = diskDir
+        self.Entries = OrderedDict()        # key -> (datas, pyramids, cost)
+        self.Used = 0
+        self.Lock = threading.Lock()
+
+    @staticmethod
+    def key(path, fmt, mmap, maxSize):
+        '''
+            Key of a file read by the format and the loading mode. The size limit
+            is in the key of the in-memory mode, so that a file over the limit is
+            refused by loading instead of served by the cache.
+        '''
+        # zip members are keyed by the archive on disk
+        stat = os.stat(split_member(path)[0])
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns,
+                fmt.Dtype.str, fmt.Offset, fmt.Stride, mmap, None if mmap else maxSize)
+
+    def get(self, key):
+        '''
+            Get (datas, pyramids, tail) of the key from memory, None if missing.
+        '''
+        with self.Lock:
+            entry = self.Entries.get(key)
+            if entry is None:
+                return None
+            self.Entries.move_to_end(key)
+            return entry[:3]
+
+    def put(self, key, datas, pyramids, tail=0):
+        '''
+            :param tail: count of trailing bytes not decoded
+        '''
+        # the first item of the key is the absolute path of the file
+        cost = sum(resident_bytes(d, key[0]) for d in datas.values()) + \
+               sum(pyramid_bytes(p) for p in pyramids.values())
+        if cost > self.Budget:
+            return
+
+        with self.Lock:
+            if key in self.Entries:
+                self.Used -= self.Entries.pop(key)[3]
+            self.Entries[key] = (datas, pyramids, tail, cost)
+            self.Used += cost
+            self.evict()
+
+    def set_budget(self, budget):
+        '''
+            Change the memory budget by MB, entries are evicted to fit a smaller one.
+        '''
+        with self.Lock:
+            self.Budget = budget * 1024 * 1024
+            self.evict()
+
+    def evict(self):
+        '''
+            Evict the least recently used entries over the budget, the lock must
+            be held.
+        '''
+        while self.Used > self.Budget:
+            _, (_, _, _, evicted) = self.Entries.popitem(last=False)
+            self.Used -= evicted
+
+    def disk_path(self, key):
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.DiskDir, name + '.npz')
+
+    def load_derived(self, key):
+        '''
+            Load the derived series of the key from disk, None if missing.
+        '''
+        if self.DiskDir is None:
+            return None
+        try:
+            with np.load(self.disk_path(key)) as f:
+                return {name: f[name] for name in f.files}
+        except (OSError, ValueError):
+            return None
+
+    def save_derived(self, key, derived):
+        '''
+            Save the derived series of the key to disk, failures are ignored
+            since the cache is only an accelerator.
+        '''
+        if self.DiskDir is None:
+            return
+        path = self.disk_path(key)
+        tmpPath = path + '.%d.tmp' % threading.get_ident()
+        try:
+            os.makedirs(self.DiskDir, exist_ok=True)
+            with open(tmpPath, 'wb') as f:
+                np.savez(f, **derived)
+            os.replace(tmpPath, path)
+        except OSError:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
@@ -0,0 +1,104 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    Comparison of the values of several files aligned by offset, such
+    as two builds of a firmware.
+
+    The values of each file are compared to a reference (the file shown
+    in the window): the element-wise difference (other - reference) is
+    computed in a widened dtype, and the mismatch runs (ranges of offsets
+    where the values differ) are indexed from the difference. Both are
+    vectorized and processed by chunks in a single pass, so memory-mapped
+    inputs are never loaded entirely. For large inputs the difference is
+    written into a memory-mapped .npy file instead of memory.
+'''
+
+import numpy as np
+
+from compute import wide_type
+
+ChunkSize = 1 << 24         # values processed per chunk
+
+def diff_values(ref, other, diffPath=None):
+    '''
+        Element-wise difference over the aligned length of the two sequences.
+        :param diffPath: the .npy file to write the difference, None to keep it
+                in memory
+    '''
+    n = min(len(ref), len(other))
+    wideType = wide_type(np.result_type(ref.dtype, other.dtype))
+    if diffPath is None:
+        diff = np.empty(n, dtype=wideType)
+    else:
+        from numpy.lib.format import open_memmap
+        diff = open_memmap(diffPath, mode='w+', dtype=wideType, shape=(n,))
+    for c0 in range(0, n, ChunkSize):
+        c1 = min(c0 + ChunkSize, n)
+        np.subtract(other[c0:c1], ref[c0:c1], out=diff[c0:c1], dtype=wideType)
+    return diff
+
+def mismatch_runs(diff):
+    '''
+        Index the runs of nonzero differences.
+        :return: starts and stops (exclusive) of the runs
+    '''
+    edges = []
+    prev = False
+    for c0 in range(0, len(diff), ChunkSize):
+        mismatch = diff[c0:c0 + ChunkSize] != 0
+        state = np.empty(len(mismatch) + 1, dtype=bool)
+        state[0] = prev
+        state[1:] = mismatch
+        # runs start and stop where the state changes
+        edges.append(np.flatnonzero(state[1:] != state[:-1]) + c0)
+        prev = mismatch[-1]
+    if prev:
+        edges.append(np.array([len(diff)]))
+
+    edges = np.concatenate(edges) if edges else np.empty(0, dtype=np.int64)
+    return edges[0::2], edges[1::2]
+
+def merge_runs(starts, stops, minGap):
+    '''
+        Merge the runs separated by less than "minGap", used to draw the
+        runs at a coarse resolution.
+    '''
+    if len(starts) == 0:
+        return starts, stops
+    keep = np.flatnonzero(starts[1:] - stops[:-1] >= minGap)
+    return starts[np.concatenate(([0], keep + 1))], stops[np.concatenate((keep, [len(stops) - 1]))]
+
+def union_runs(starts, stops):
+    '''
+        Union of runs which may overlap, such as the runs of several files.
+    '''
+    if len(starts) == 0:
+        return starts, stops
+    order = np.argsort(starts, kind='stable')
+    starts = starts[order]
+    ends = np.maximum.accumulate(stops[order])
+    breaks = np.flatnonzero(starts[1:] > ends[:-1])
+    return starts[np.concatenate(([0], breaks + 1))], ends[np.concatenate((breaks, [len(ends) - 1]))]
+
+def compare_values(ref, other, diffPath=None):
+    '''
+        Compare a sequence to the reference. Offsets beyond the shorter one
+        are counted as a mismatch run.
+        :param diffPath: the .npy file to write the difference, None to keep it
+                in memory
+        :return: dict of the difference, the mismatch runs and the count of
+                mismatched values
+    '''
+    diff = diff_values(ref, other, diffPath)
+    starts, stops = mismatch_runs(diff)
+    longer = max(len(ref), len(other))
+    if longer > len(diff):
+        starts = np.append(starts, len(diff))
+        stops = np.append(stops, longer)
+
+    return {
+        'diff': diff,
+        'starts': starts,
+        'stops': stops,
+        'mismatched': int((stops - starts).sum()),
+    }
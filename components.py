@@ -8,6 +8,15 @@
     When color is set to change, slot functions are obliged
     to call the "emit" method to transfer the new RGB value
     to the processing slot functions.
+
+    A dialog class WordFormatDialog is also contained to choose
+    the word format of the loaded files, a panel class
+    SearchPanel to search the loaded values and a panel class
+    SpectrumPanel to show the spectrum of them, a panel class
+    HistogramPanel to show the byte histograms of sliding windows,
+    a panel class OverviewPanel to show them as an image, and a
+    panel class RegionPanel to show the statistics of a selected
+    range.
 '''
 
 from PyQt5 import QtWidgets as widgets
@@ -25,3 +34,316 @@ class ColorFrame(widgets.QFrame):
     def emit(self, rgb):
         self.ColorChanged.emit(rgb)
 
+
+
+class WordFormatDialog(widgets.QDialog):
+    '''
+        Dialog to choose the word format of files, the fields are
+        initialized by the current configs and read back by "values".
+    '''
+
+    def __init__(self, parent, cfg):
+        super(WordFormatDialog, self).__init__(parent)
+        self.setWindowTitle('Word format')
+        layout = widgets.QFormLayout(self)
+
+        self.TypeBox = widgets.QComboBox(self)
+        self.TypeBox.addItems(['int', 'uint', 'float'])
+        self.TypeBox.setCurrentText(cfg.WordType)
+        layout.addRow('type', self.TypeBox)
+
+        self.BitsBox = widgets.QComboBox(self)
+        self.BitsBox.addItems(['8', '16', '32', '64'])
+        self.BitsBox.setCurrentText(str(cfg.WordBits))
+        layout.addRow('bits', self.BitsBox)
+
+        self.OrderBox = widgets.QComboBox(self)
+        self.OrderBox.addItems(['native', 'little', 'big'])
+        self.OrderBox.setCurrentText(cfg.ByteOrder)
+        layout.addRow('byte order', self.OrderBox)
+
+        self.OffsetBox = widgets.QSpinBox(self)
+        self.OffsetBox.setRange(0, 2**31 - 1)
+        self.OffsetBox.setValue(cfg.WordOffset)
+        layout.addRow('offset (byte)', self.OffsetBox)
+
+        self.StrideBox = widgets.QSpinBox(self)
+        self.StrideBox.setRange(0, 2**31 - 1)
+        self.StrideBox.setValue(cfg.WordStride)
+        layout.addRow('stride (byte, 0 for packed)', self.StrideBox)
+
+        buttons = widgets.QDialogButtonBox(widgets.QDialogButtonBox.Ok | widgets.QDialogButtonBox.Cancel, parent=self)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def values(self):
+        return {
+            'WordType': self.TypeBox.currentText(),
+            'WordBits': int(self.BitsBox.currentText()),
+            'ByteOrder': self.OrderBox.currentText(),
+            'WordOffset': self.OffsetBox.value(),
+            'WordStride': self.StrideBox.value(),
+        }
+
+
+class SearchPanel(widgets.QWidget):
+    '''
+        Panel to search the loaded values and list the hits. A search
+        request is emitted with the mode and the query text, and a hit
+        is emitted by its offset when it is clicked.
+    '''
+    SearchRequested = core.pyqtSignal(str, str)     # mode, query text
+    HitActivated = core.pyqtSignal(int)             # offset of hit
+
+    Modes = ['bytes (hex)', 'value range', 'crossing up', 'crossing down']
+
+    def __init__(self, parent=None):
+        super(SearchPanel, self).__init__(parent)
+        layout = widgets.QVBoxLayout(self)
+
+        self.ModeBox = widgets.QComboBox(self)
+        self.ModeBox.addItems(self.Modes)
+        layout.addWidget(self.ModeBox)
+
+        self.QueryEdit = widgets.QLineEdit(self)
+        self.QueryEdit.setPlaceholderText('de ad be ef / lo hi / threshold')
+        self.QueryEdit.returnPressed.connect(self.request)
+        layout.addWidget(self.QueryEdit)
+
+        self.SearchButton = widgets.QPushButton('search', self)
+        self.SearchButton.clicked.connect(self.request)
+        layout.addWidget(self.SearchButton)
+
+        self.StatusLabel = widgets.QLabel(self)
+        layout.addWidget(self.StatusLabel)
+
+        self.HitList = widgets.QListWidget(self)
+        self.HitList.itemClicked.connect(lambda item: self.HitActivated.emit(item.data(core.Qt.UserRole)))
+        layout.addWidget(self.HitList)
+
+    def request(self):
+        self.SearchRequested.emit(self.ModeBox.currentText(), self.QueryEdit.text())
+
+    def set_status(self, text):
+        self.StatusLabel.setText(text)
+
+    def set_hits(self, hits, limit):
+        self.HitList.clear()
+        for hit in hits:
+            item = widgets.QListWidgetItem('offset %d' % hit)
+            item.setData(core.Qt.UserRole, int(hit))
+            self.HitList.addItem(item)
+        more = ' (limited)' if len(hits) >= limit else ''
+        self.set_status('%d hits%s' % (len(hits), more))
+
+class SpectrumPanel(widgets.QWidget):
+    '''
+        Panel showing the mean spectrum of the loaded values and the
+        spectrogram (offset against frequency) as an image. Clicking
+        the spectrogram emits the offset of the clicked row.
+    '''
+    OffsetActivated = core.pyqtSignal(int)          # offset of clicked row
+
+    def __init__(self, parent=None):
+        super(SpectrumPanel, self).__init__(parent)
+        # pyqtgraph is loaded with the window, not by the file dialog
+        import pyqtgraph as pg
+
+        layout = widgets.QVBoxLayout(self)
+        self.Span = 0                   # offsets covered by the spectrogram
+        self.StatusLabel = widgets.QLabel(self)
+        layout.addWidget(self.StatusLabel)
+
+        self.SpectrumPlot = pg.PlotWidget()
+        self.SpectrumPlot.setLabel('bottom', 'frequency', units='cycles/sample')
+        self.SpectrumPlot.setLabel('left', 'power', units='dB')
+        self.SpectrumItem = self.SpectrumPlot.plot()
+        layout.addWidget(self.SpectrumPlot)
+
+        self.SpectrogramPlot = pg.PlotWidget()
+        self.SpectrogramPlot.setLabel('bottom', 'offset')
+        self.SpectrogramPlot.setLabel('left', 'frequency', units='cycles/sample')
+        self.ImageItem = pg.ImageItem()
+        self.ImageItem.setColorMap(pg.colormap.get('viridis'))
+        self.SpectrogramPlot.addItem(self.ImageItem)
+        self.SpectrogramPlot.scene().sigMouseClicked.connect(self.clicked)
+        layout.addWidget(self.SpectrogramPlot)
+
+    def set_status(self, text):
+        self.StatusLabel.setText(text)
+
+    def set_result(self, result):
+        '''
+            Show a result of "spectral.Spectrogram.result", rows of the image
+            are placed at their offsets.
+        '''
+        image = result['image']
+        self.Span = len(image) * result['rowSpan']
+        # no frame at all, the image of no row can not be placed
+        if len(image) == 0:
+            self.SpectrumItem.clear()
+            self.ImageItem.clear()
+            self.set_status('file shorter than the window')
+            return
+
+        self.SpectrumItem.setData(result['freqs'], result['spectrum'])
+        self.ImageItem.setImage(image)
+        self.ImageItem.setRect(core.QRectF(0, 0, self.Span, 0.5))
+        self.set_status('%d%% computed' % int(100 * result['done']))
+
+    def clicked(self, ev):
+        pos = self.SpectrogramPlot.getViewBox().mapSceneToView(ev.scenePos())
+        if 0 <= pos.x() < self.Span and 0 <= pos.y() <= 0.5:
+            self.OffsetActivated.emit(int(pos.x()))
+
+class HistogramPanel(widgets.QWidget):
+    '''
+        Panel showing the byte histograms of the sliding windows as an
+        image (offset against byte value). Clicking the image emits the
+        offset of the clicked row.
+    '''
+    OffsetActivated = core.pyqtSignal(int)          # offset of clicked row
+
+    def __init__(self, parent=None):
+        super(HistogramPanel, self).__init__(parent)
+        import pyqtgraph as pg
+
+        layout = widgets.QVBoxLayout(self)
+        self.Span = 0                   # offsets covered by the image
+        self.StatusLabel = widgets.QLabel(self)
+        layout.addWidget(self.StatusLabel)
+
+        self.ImagePlot = pg.PlotWidget()
+        self.ImagePlot.setLabel('bottom', 'offset')
+        self.ImagePlot.setLabel('left', 'byte value')
+        self.ImageItem = pg.ImageItem()
+        self.ImageItem.setColorMap(pg.colormap.get('viridis'))
+        self.ImagePlot.addItem(self.ImageItem)
+        self.ImagePlot.scene().sigMouseClicked.connect(self.clicked)
+        layout.addWidget(self.ImagePlot)
+
+    def set_status(self, text):
+        self.StatusLabel.setText(text)
+
+    def set_result(self, result):
+        '''
+            Show a result of "slidingStats.HistogramImage.result", rows of the
+            image are placed at their offsets.
+        '''
+        image = result['image']
+        self.Span = len(image) * result['rowSpan']
+        if len(image) == 0:
+            self.ImageItem.clear()
+            self.set_status('file shorter than the window')
+            return
+
+        self.ImageItem.setImage(image)
+        self.ImageItem.setRect(core.QRectF(0, 0, self.Span, 256))
+        self.set_status('%d%% computed' % int(100 * result['done']))
+
+    def clicked(self, ev):
+        pos = self.ImagePlot.getViewBox().mapSceneToView(ev.scenePos())
+        if 0 <= pos.x() < self.Span and 0 <= pos.y() <= 256:
+            self.OffsetActivated.emit(int(pos.x()))
+
+class OverviewPanel(widgets.QWidget):
+    '''
+        Panel showing the overview image of the loaded values. Clicking
+        a pixel emits the offset of it, and switching the layout (rows
+        or Hilbert curve) emits the new layout.
+    '''
+    OffsetActivated = core.pyqtSignal(int)          # offset of clicked pixel
+    LayoutChanged = core.pyqtSignal(bool)           # whether Hilbert curve is used
+
+    def __init__(self, hilbert, parent=None):
+        super(OverviewPanel, self).__init__(parent)
+        import pyqtgraph as pg
+
+        layout = widgets.QVBoxLayout(self)
+        self.Overview = None
+        self.HilbertBox = widgets.QCheckBox('Hilbert curve', self)
+        self.HilbertBox.setChecked(hilbert)
+        self.HilbertBox.toggled.connect(self.LayoutChanged.emit)
+        layout.addWidget(self.HilbertBox)
+
+        self.StatusLabel = widgets.QLabel(self)
+        layout.addWidget(self.StatusLabel)
+
+        self.ImagePlot = pg.PlotWidget()
+        self.ImagePlot.getViewBox().invertY(True)
+        self.ImagePlot.getViewBox().setAspectLocked(True)
+        self.ImageItem = pg.ImageItem()
+        self.ImageItem.setColorMap(pg.colormap.get('inferno'))
+        self.ImagePlot.addItem(self.ImageItem)
+        self.ImagePlot.scene().sigMouseClicked.connect(self.clicked)
+        layout.addWidget(self.ImagePlot)
+
+    def set_status(self, text):
+        self.StatusLabel.setText(text)
+
+    def set_overview(self, overview):
+        '''
+            Show an "overview.Overview", empty pixels are transparent.
+        '''
+        import numpy as np
+
+        self.Overview = overview
+        if overview.Size == 0:
+            self.ImageItem.clear()
+        else:
+            self.ImageItem.setImage(overview.Image, autoLevels=False,
+                                    levels=(np.nanmin(overview.Image), np.nanmax(overview.Image)))
+        self.ImagePlot.autoRange()
+        self.set_status('%d values per pixel' % overview.Bin)
+
+    def clicked(self, ev):
+        if self.Overview is None:
+            return
+        pos = self.ImageItem.mapFromScene(ev.scenePos())
+        offset = self.Overview.offset_at(pos.x(), pos.y())
+        if offset is not None:
+            self.OffsetActivated.emit(offset)
+
+class RegionPanel(widgets.QWidget):
+    '''
+        Panel showing the statistics of the selected range of values and
+        the byte histogram of it.
+    '''
+    def __init__(self, parent=None):
+        super(RegionPanel, self).__init__(parent)
+        import pyqtgraph as pg
+
+        layout = widgets.QVBoxLayout(self)
+        self.StatusLabel = widgets.QLabel(self)
+        self.StatusLabel.setTextInteractionFlags(core.Qt.TextSelectableByMouse)
+        layout.addWidget(self.StatusLabel)
+
+        self.HistogramPlot = pg.PlotWidget()
+        self.HistogramPlot.setLabel('bottom', 'byte')
+        self.HistogramPlot.setLabel('left', 'count')
+        self.HistogramItem = self.HistogramPlot.plot(stepMode='center', fillLevel=0, brush=(100, 100, 255, 150))
+        layout.addWidget(self.HistogramPlot)
+
+    def set_status(self, text):
+        self.StatusLabel.setText(text)
+
+    def set_stats(self, start, stop, stats):
+        '''
+            Show a result of "regionStats.RegionStats.query" of [start, stop).
+        '''
+        import numpy as np
+
+        if stats is None:
+            self.HistogramItem.setData([0, 1], [0])
+            self.set_status('[%d, %d)  empty' % (start, stop))
+            return
+        number = '%.6g' if isinstance(stats['min'], (float, np.floating)) else '%d'
+        self.set_status('\n'.join([
+            '[%d, %d)  count: %d' % (start, stop, stats['count']),
+            ('min: ' + number + '    max: ' + number) % (stats['min'], stats['max']),
+            'mean: %.6g    std: %.6g' % (stats['mean'], stats['std']),
+            'integral delta: %.6g' % stats['delta'],
+            'entropy: %.4f bits/byte' % stats['entropy'],
+        ]))
+        self.HistogramItem.setData(np.arange(257), stats['histogram'])
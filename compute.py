@@ -6,25 +6,137 @@
     values based on the values read.
 
     Values input should be a Numpy array but not a list,
-    returning type is list instead.
+    returning type is a Numpy array as well. All computations
+    are vectorized and done in a widened dtype (int64 for integer
+    inputs, float64 for float and 64 bits unsigned inputs) so that the
+    results never wrap on overflow of the input type.
+
+    Both functions accept the carry of the values before "vals",
+    so that a sequence processed piece by piece (such as a growing
+    file) gives the same result as processed at once.
+
+    For the values too large for memory, "cal_chunked" processes a
+    memory-mapped input block by block with the carries and writes
+    the results into memory-mapped .npy files, the peak memory is
+    bounded by the block size and the results are identical to the
+    in-memory functions.
+
+    "cal_integrate_parallel" splits the integration into blocks on a
+    thread pool (NumPy releases the GIL in cumsum): the blocks are
+    summed independently, then the sums of the former blocks are added
+    to each block in a second pass.
 '''
 
-def cal_differential(vals):
-    minuend = vals[:-1]
-    subtrahend = vals[1:]
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import numpy as np
 
-    # substract difference
-    diff = (subtrahend-minuend).tolist()
-    # first differential value should be 0 anytime
-    diff.insert(0,0)
+BlockSize = 1 << 22         # count of samples computed at a time by cal_chunked
+ParallelMin = 1 << 21       # values shorter than this are integrated by one thread
+
+def wide_type(dtype):
+    dtype = np.dtype(dtype)
+    # uint64 above 2**63 does not fit int64
+    if dtype.kind == 'f' or (dtype.kind == 'u' and dtype.itemsize == 8):
+        return np.float64
+    return np.int64
+
+def cal_differential(vals, prev=None):
+    '''
+        :param prev: the value before "vals", None for the head of sequence
+    '''
+    wideType = wide_type(vals.dtype)
+    diff = np.empty(len(vals), dtype=wideType)
+    if len(vals) == 0:
+        return diff
+
+    # first differential value should be 0 at the head of sequence
+    diff[0] = 0 if prev is None else wideType(vals[0]) - wideType(prev)
+    # substract difference in the widened type
+    np.subtract(vals[1:], vals[:-1], out=diff[1:], dtype=wideType)
     return diff
 
-def cal_integrate(vals):
-    integrate = []
-    curVal = 0
+def cal_integrate(vals, start=0):
+    '''
+        :param start: the integrate value before "vals"
+    '''
+    wideType = wide_type(vals.dtype)
+    integrate = np.empty(len(vals), dtype=wideType)
+    if start and len(vals) > 0:
+        # the start is summed first, so that float sums are rounded as
+        # the sums of the whole sequence at once
+        integrate[:] = vals
+        integrate[0] += wideType(start)
+        np.cumsum(integrate, out=integrate)
+    else:
+        np.cumsum(vals, dtype=wideType, out=integrate)
+    return integrate
+
+def cal_integrate_parallel(vals, start=0, threads=None):
+    '''
+        Integrate by the threads, the result equals "cal_integrate". Float values
+        are integrated by one thread since adding the block sums afterwards
+        changes the rounding.
+        :param threads: count of threads, None for the count of CPUs
+    '''
+    wideType = wide_type(vals.dtype)
+    threads = threads or os.cpu_count() or 1
+    n = len(vals)
+    if threads <= 1 or n < ParallelMin or wideType is np.float64:
+        return cal_integrate(vals, start)
+
+    integrate = np.empty(n, dtype=wideType)
+    bounds = np.linspace(0, n, threads + 1).astype(np.int64)
+    blocks = list(zip(bounds[:-1], bounds[1:]))
+
+    def scan(block):
+        b0, b1 = block
+        np.cumsum(vals[b0:b1], dtype=wideType, out=integrate[b0:b1])
+
+    def shift(block, offset):
+        b0, b1 = block
+        integrate[b0:b1] += offset
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(scan, blocks))
+        # sum of all the values before each block
+        offsets = np.cumsum([wideType(start)] + [integrate[b1 - 1] for _, b1 in blocks[:-1]], dtype=wideType)
+        if not start:
+            blocks, offsets = blocks[1:], offsets[1:]
+        list(executor.map(shift, blocks, offsets))
+    return integrate
+
+def cal_chunked(vals, diffPath, intPath, block=BlockSize, progress=None, cancelled=None):
+    '''
+        Compute the differential and integrate values by blocks into memory-mapped
+        .npy files. The previous value and the running sum are carried between
+        blocks.
+        :param diffPath, intPath: the .npy files to write the results
+        :param progress, cancelled: callbacks of Worker, progress is by percent
+        :return: the memory-mapped differential and integrate values, or None if
+                cancelled
+    '''
+    from numpy.lib.format import open_memmap
+
+    wideType = wide_type(vals.dtype)
+    n = len(vals)
+    diff = open_memmap(diffPath, mode='w+', dtype=wideType, shape=(n,))
+    integrate = open_memmap(intPath, mode='w+', dtype=wideType, shape=(n,))
+
+    prev, total = None, 0
+    for b0 in range(0, n, block):
+        b1 = min(b0 + block, n)
+        chunk = vals[b0:b1]
+        diff[b0:b1] = cal_differential(chunk, prev)
+        integrate[b0:b1] = cal_integrate(chunk, total)
+        prev, total = chunk[-1], integrate[b1 - 1]
 
-    for val in vals:
-        curVal += val
-        integrate.append(curVal)
+        if progress is not None:
+            progress(100 * b1 // n)
+        if cancelled is not None and cancelled():
+            return None
 
-    return integrate
\ No newline at end of file
+    diff.flush()
+    integrate.flush()
+    return diff, integrate
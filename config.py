@@ -6,103 +6,278 @@
     save the changes to file. Config values are accessible through config
     manager.
 
-    The usable settings will be contained in an independent class called
-    ConfigSet and the management of configs belong to a class called
-    ConfigManager.
+    The usable settings are described by a schema, in which each item has
+    a default value (deciding its type) and an optional check of its value.
+    The settings are contained in an independent class called ConfigSet,
+    whose attributes are fixed by __slots__, and the management of configs
+    belong to a class called ConfigManager.
+
+    Items are validated one by one when read, an illegal or missing item
+    is replaced by its default without discarding the others. Changing an
+    item by "ConfigSet.set" validates it and notifies the listeners, so
+    that the changes are applied at once and saved to the config file.
 '''
 
 import json
+import os
+
+class Field:
+    '''
+        Schema of a config item: the default value, whose type is the type of
+        item, and a check returning whether a value of the type is legal.
+    '''
+    __slots__ = ('Default', 'Type', 'Check')
+
+    def __init__(self, default, check=None):
+        self.Default = default
+        self.Type = type(default)
+        self.Check = check
+
+    def validate(self, value):
+        '''
+            Return the legal value, or raise ValueError.
+        '''
+        # bool is a subclass of int but never a legal number
+        if isinstance(value, bool) != (self.Type is bool):
+            raise ValueError('类型错误')
+        if self.Type is float and isinstance(value, int):
+            value = float(value)
+        if not isinstance(value, self.Type):
+            raise ValueError('类型错误')
+        if self.Check is not None and not self.Check(value):
+            raise ValueError('取值非法')
+        # lists are copied so that the defaults are never shared
+        return list(value) if isinstance(value, list) else value
+
+def positive(v):
+    return v > 0
+
+def non_negative(v):
+    return v >= 0
+
+def one_of(*choices):
+    return lambda v: v in choices
+
+def rgb(v):
+    return len(v) == 3 and all(isinstance(c, int) and not isinstance(c, bool) and 0 <= c <= 255 for c in v)
+
+PlotNames = ['Value', 'Differential', 'Integrate', 'Entropy', 'Mean', 'Variance']
+
+Schema = [
+    ('MaxFileSize', Field(50, positive)),               # size limit of files read into memory by KB
+    ('MemoryMapped', Field(True)),                      # map file into memory, no size limit
+    ('WordType', Field('int', one_of('int', 'uint', 'float'))),
+    ('WordBits', Field(16, one_of(8, 16, 32, 64))),
+    ('ByteOrder', Field('native', one_of('native', 'little', 'big'))),
+    ('WordOffset', Field(0, non_negative)),             # bytes skipped at the beginning of file
+    ('WordStride', Field(0, non_negative)),             # bytes between two words, 0 for packed words
+    ('CacheBudget', Field(512, non_negative)),          # memory budget of cached files by MB
+    ('DiskCache', Field(False)),                        # cache derived series on disk
+    ('CacheDir', Field('cache')),
+    ('OutOfCoreSize', Field(256, non_negative)),        # mapped values above this size by MB are computed by blocks on disk
+    ('ScratchDir', Field('')),                          # directory of the on-disk derived series, empty for the system temp
+    ('IntegrateThreads', Field(0, non_negative)),       # threads integrating the values, 0 for the count of CPUs
+    ('FollowInterval', Field(1000, positive)),          # polling interval of followed file by ms
+] + [
+    (name + 'Visible', Field(name in PlotNames[:3])) for name in PlotNames
+] + [
+    (name + 'Marker', Field(True)) for name in PlotNames
+] + [
+    ('StatsWindow', Field(256, positive)),              # window size of sliding statistics by sample
+    ('StatsStep', Field(64, positive)),                 # step of sliding windows by sample
+    ('SpectrumWindow', Field(1024, lambda v: v >= 2)),  # frame size of spectrum by sample
+    ('SpectrumHop', Field(512, positive)),              # step between frames of spectrum by sample
+    ('SpectrumWindowFunc', Field('hann', one_of('hann', 'hamming', 'blackman', 'rect'))),
+    ('SpectrogramRows', Field(1024, positive)),         # max count of rows of spectrogram, frames are averaged
+    ('HistogramRows', Field(1024, positive)),           # max count of rows of byte histogram image, windows are averaged
+    ('OverviewWidth', Field(256, positive)),            # pixels of a row of overview image
+    ('OverviewPixels', Field(1048576, positive)),       # max count of pixels of overview image, values are averaged
+    ('OverviewHilbert', Field(False)),                  # lay the pixels along a Hilbert curve instead of rows
+    ('RegionBlock', Field(1024, positive)),             # samples of a block of region statistics, partial blocks are scanned
+    ('ShowGrid', Field(True)),
+    ('LinkXAxes', Field(True)),                         # all plots share one view range of x
+    ('SearchLimit', Field(10000, positive)),            # max count of search hits
+    ('SearchIndexLimit', Field(64, non_negative)),      # byte index (4 bytes per byte) is built for values below this size by MB
+    ('JumpSpan', Field(2000, positive)),                # max span of view when jumping to a hit
+    ('PlotBgColor', Field([0, 0, 0], rgb)),             # white bg in default
+    ('PlotCurveColor', Field([255, 255, 255], rgb)),    # black curve in default
+    ('Marker', Field('o', one_of('o', 's', 't', 't1', 't2', 't3', 'd', '+', 'x', 'p', 'h', 'star',
+                                 '|', '_', 'arrow_up', 'arrow_right', 'arrow_down', 'arrow_left',
+                                 'crosshair'))),           # symbols of pyqtgraph
+    ('MarkerThreshold', Field(2000, non_negative)),     # markers are drawn below this count of visible points
+    ('RenderBackend', Field('raster', one_of('raster', 'opengl', 'software'))),  # 'software' is Mesa software OpenGL
+    ('Antialias', Field(False)),
+    ('ClipToView', Field(True)),                        # only points in view are given to the painter
+    ('AutoDownsample', Field(True)),                    # downsample the points to the pixels of view
+    ('DownsampleMethod', Field('peak', one_of('subsample', 'mean', 'peak'))),
+    ('MarkerColor', Field([0, 0, 255], rgb)),
+    ('WindowWidth', Field(1800, positive)),
+    ('WindowHeight', Field(1400, positive)),
+    ('PlotWidth', Field(1500, positive)),
+    ('PlotHeight', Field(400, positive)),
+    ('PlotSlots', Field(3, positive)),                  # count of plots fitting the window by PlotHeight
+    ('LabelOneFontStyle', Field("QLabel{color:rgb(0,0,200);font-size:20px;font-weight:normal;font-family:Arial;}")),
+    ('LabelTwoFontStyle', Field("QLabel{color:rgb(0,0,0);font-size:15px;font-weight:normal;font-family:Arial;}")),
+    ('LabelThreeFontStyle', Field("QLabel{color:rgb(0,0,0);font-size:18px;font-weight:normal;font-family:Arial;}")),
+    ('ProfileOverlay', Field(False)),                   # show timings of loading and painting in status bar
+    ('TraceFile', Field('')),                           # file of Chrome trace saved at exit, empty for no trace
+    ('IconPath', Field('icon.png')),
+]
+Fields = dict(Schema)
 
 class ConfigSet:
+    '''
+        Typed config items of the schema, read as attributes (or by name).
+    '''
+    __slots__ = tuple(Fields) + ('Listeners',)
 
     def __init__(self):
-        self.MaxFileSize = 50
-        self.ValueVisible = True
-        self.DifferentialVisible = True
-        self.IntegrateVisible = True
-        self.ValueMarker = True
-        self.DifferentialMarker = True
-        self.IntegrateMarker = True
-        self.ShowGrid = True
-        self.PlotBgColor = [0, 0, 0]  # white bg in default
-        self.PlotCurveColor = [255, 255, 255]  # black curve in default
-        self.Marker = 'o'
-        self.MarkerColor = [0, 0, 255]
-        self.WindowWidth = 1800
-        self.WindowHeight = 1400
-        self.PlotWidth = 1500
-        self.PlotHeight = 400
-        self.LabelOneFontStyle = "QLabel{color:rgb(0,0,200);font-size:20px;font-weight:normal;font-family:Arial;}"
-        self.LabelTwoFontStyle = "QLabel{color:rgb(0,0,0);font-size:15px;font-weight:normal;font-family:Arial;}"
-        self.LabelThreeFontStyle = "QLabel{color:rgb(0,0,0);font-size:18px;font-weight:normal;font-family:Arial;}"
-        self.IconPath = 'icon.png'
+        for k, field in Schema:
+            setattr(self, k, field.validate(field.Default))
+        self.Listeners = []
 
     def isVisible(self, plotName):
         '''
             fast way to read visibility information
-            :param plotName: the name of plot, only allow 'Value',
+            :param plotName: the name of plot, such as 'Value',
                     'Differential' and 'Integrate'
         '''
-        # assert plotName in ['Value','Differential', 'Integrate']
-        return self.__getattribute__(plotName+'Visible')
-    
+        return getattr(self, plotName + 'Visible')
+
     def items(self):
-        return self.__dict__.items()
+        return [(k, getattr(self, k)) for k in Fields]
 
     def keys(self):
-        return self.__dict__.keys()
+        return Fields.keys()
+
+    def __getitem__(self, k):
+        if k not in Fields:
+            raise KeyError(k)
+        return getattr(self, k)
+
+    def subscribe(self, listener):
+        '''
+            The listener is called with the name and the new value of each
+            changed item.
+        '''
+        self.Listeners.append(listener)
 
     def set(self, k, v):
-        self.__dict__[k] = v
+        '''
+            Validate and change an item, listeners are notified when the value
+            is changed. KeyError is raised for unknown items and ValueError for
+            illegal values.
+        '''
+        v = Fields[k].validate(v)
+        if getattr(self, k) == v:
+            return
+        setattr(self, k, v)
+        for listener in list(self.Listeners):
+            listener(k, v)
+
+    __setitem__ = set
+
+    def update(self, config):
+        '''
+            Change the items of a dict one by one, the illegal items are skipped.
+            :return: list of (name, message) of the skipped items
+        '''
+        errors = []
+        for k, v in config.items():
+            try:
+                self.set(k, v)
+            except KeyError:
+                errors.append((k, '未知的配置项'))
+            except ValueError as exc:
+                errors.append((k, str(exc)))
+        return errors
+
+    def to_dict(self):
+        return dict(self.items())
 
 class CongfigManager:
 
-    def __init__(self, configPath='config.json'):
+    def __init__(self, configPath='config.json', autoSave=False):
+        '''
+            :param autoSave: save the config file whenever an item is changed
+        '''
+        self.ConfigPath = configPath
         self.defaultConfig = ConfigSet()
+        self.Errors = []            # (name, message) of the items replaced by default
         self.readConfig = self.loadConfig(configPath)
+        if autoSave:
+            self.readConfig.subscribe(lambda k, v: self.save())
 
-
-    def loadConfig(self, path):
+    def readFile(self, path):
+        '''
+            Read the dict of config file, None (with the error recorded) if the
+            file is missing or broken.
+        '''
         if not path.endswith('.json'):
-            return ConfigSet().__dict__
+            return None
         try:
-            with open(path, 'r') as f:
+            with open(path, 'r', encoding='utf-8') as f:
                 configs = json.load(f)
-                configs = self.checkAndCorrectConfig(configs)
-                return configs
-        except:
-            return ConfigSet().__dict__
-
+        except OSError:
+            return None
+        except ValueError:
+            self.Errors = [(path, '无法解析配置文件')]
+            return None
+        if not isinstance(configs, dict):
+            self.Errors = [(path, '无法解析配置文件')]
+            return None
+        return configs
 
+    def loadConfig(self, path):
+        config = ConfigSet()
+        configs = self.readFile(path)
+        if configs is not None:
+            self.checkAndCorrectConfig(configs, config)
+        return config
 
-    def checkAndCorrectConfig(self, config):
+    def checkAndCorrectConfig(self, config, checkedConfig=None):
         '''
-            Check the attributes and values in read config, correct the
-            illegal value and complement the missing attributes.
+            Check the items in read config, the illegal and missing items are
+            replaced by the defaults and the redundant items are ignored, the
+            others are kept.
+            :return: the checked ConfigSet
         '''
-        checkedConfig = config
-
-        for k,dv in self.defaultConfig.items():
-            if k not in checkedConfig.keys():       # expected value not exist in read configs
-                checkedConfig[k] = dv
-
-            elif type(checkedConfig[k]) != type(dv):        # illegal data type found in read configs
-                print('illegal key in config',k)
-                checkedConfig[k] = dv
-
-        for ck in checkedConfig.keys():
-            if ck not in self.defaultConfig.keys():     # remove the redundant items
-                del checkedConfig[ck]
-        
+        checkedConfig = checkedConfig or ConfigSet()
+        self.Errors = checkedConfig.update(config)
+        for k, msg in self.Errors:
+            print('illegal key in config', k, msg)
         return checkedConfig
 
-    def get(self, name):
-        return self.readConfig[name]
-
-        
-
-            
-
+    def reload(self):
+        '''
+            Read the config file again and apply the changed items, listeners
+            are notified of them.
+            :return: list of (name, message) of the illegal items
+        '''
+        configs = self.readFile(self.ConfigPath)
+        if configs is not None:
+            # missing items are back to default
+            defaults = {k: v for k, v in self.defaultConfig.items() if k not in configs}
+            self.Errors = self.readConfig.update(dict(configs, **defaults))
+        return self.Errors
 
+    def save(self, path=None):
+        '''
+            Write all items to the config file, through a temporary file so
+            that a failed writing never breaks the file.
+        '''
+        path = path or self.ConfigPath
+        tmpPath = path + '.tmp'
+        try:
+            with open(tmpPath, 'w', encoding='utf-8') as f:
+                json.dump(self.readConfig.to_dict(), f, indent=4, ensure_ascii=False)
+            os.replace(tmpPath, path)
+        except OSError:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
 
+    def get(self, name):
+        return getattr(self.readConfig, name)
 
+    def set(self, name, value):
+        self.readConfig.set(name, value)
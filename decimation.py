@@ -0,0 +1,238 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    This module offers a level-of-detail pyramid for plotting long
+    sequences. Each level of the pyramid keeps the minimum and maximum
+    of fixed-size blocks of the sequence, and every level is reduced
+    from the previous one by a constant factor.
+
+    When a view range and a pixel width are given, the level whose
+    blocks fit the pixels is chosen and only the blocks inside the view
+    are returned, so the count of drawn points is bounded by the pixel
+    width instead of the sequence length. Small ranges are served by the
+    raw values directly.
+
+    All reductions are vectorized and done by chunks, and the raw sequence
+    is never copied, a memory-mapped array stays on disk. The count of
+    blocks of the finest level is bounded, the leaf is enlarged for long
+    sequences so that the pyramid stays small however long the sequence
+    is, and the views finer than the leaf are reduced from the raw values
+    when queried (at most a leaf per pixel is read). When a range of the
+    sequence is changed or new values are appended, only the blocks
+    covering the changed range are reduced again.
+
+    A sequence sampled every several offsets (such as the statistics of
+    sliding windows) is placed on the offset axis by "xStep". The x
+    arrays returned by queries only depend on the length of sequence and
+    the view, they are shared by the pyramids of equal-length sequences
+    (Value, Differential and Integrate) instead of being built per plot.
+'''
+
+from collections import OrderedDict
+
+import numpy as np
+
+LeafSize = 4            # block size of the finest level
+Factor = 4              # reduction factor between two successive levels
+MaxLeaves = 1 << 20     # the leaf is enlarged by Factor until the blocks of the finest level fit
+ChunkSize = 1 << 22     # values reduced at a time
+SharedXSize = 16        # count of x arrays kept for sharing
+
+SharedX = OrderedDict()
+
+def shared_x(key, build):
+    '''
+        Get the x array of the key from the shared ones, or build and share it.
+        Shared arrays must not be modified.
+    '''
+    x = SharedX.get(key)
+    if x is None:
+        x = build()
+        SharedX[key] = x
+        if len(SharedX) > SharedXSize:
+            SharedX.popitem(last=False)
+    else:
+        SharedX.move_to_end(key)
+    return x
+
+def reduce_minmax(mins, maxs, k):
+    '''
+        Reduce the min and max sequences by blocks of size k, the last
+        block may be shorter.
+    '''
+    n = len(mins)
+    cnt = -(-n // k)
+    newMins = np.empty(cnt, dtype=mins.dtype)
+    newMaxs = np.empty(cnt, dtype=maxs.dtype)
+    step = max(ChunkSize // k, 1) * k
+    for c0 in range(0, n, step):
+        idx = np.arange(0, min(step, n - c0), k)
+        newMins[c0 // k:c0 // k + len(idx)] = np.minimum.reduceat(mins[c0:c0 + step], idx)
+        newMaxs[c0 // k:c0 // k + len(idx)] = np.maximum.reduceat(maxs[c0:c0 + step], idx)
+    return newMins, newMaxs
+
+def leaf_size(n, leafSize=LeafSize, factor=Factor):
+    '''
+        Leaf of a sequence of length n, so that the finest level has at most
+        MaxLeaves blocks.
+    '''
+    while n > leafSize * MaxLeaves:
+        leafSize *= factor
+    return leafSize
+
+class MinMaxPyramid:
+    '''
+        A multi-resolution min/max pyramid of a sequence, queried by the
+        view range and the pixel width of a plot.
+    '''
+    def __init__(self, vals, leafSize=LeafSize, factor=Factor, xStep=1):
+        self.Vals = vals
+        self.MinLeaf = leafSize
+        self.LeafSize = leaf_size(len(vals), leafSize, factor)
+        self.Factor = factor
+        self.XStep = xStep      # offset between two successive values
+        self.Levels = []        # (blockSize, mins, maxs) from fine to coarse
+
+        self.refresh(vals, 0)
+
+    def __len__(self):
+        return len(self.Vals)
+
+    def refresh(self, vals, start, stop=None):
+        '''
+            Update the pyramid after the values in [start, stop) are changed. None
+            stop means the values from start to the end are changed or appended,
+            otherwise the length of sequence must be kept. Blocks out of the
+            changed range are reused.
+        '''
+        start = min(start, len(self.Vals))
+        self.Vals = vals
+        n = len(vals)
+        if n == 0:
+            self.Levels = []
+            return
+
+        # a grown sequence may need a larger leaf, all levels are built again
+        leafSize = leaf_size(n, self.MinLeaf, self.Factor)
+        if leafSize != self.LeafSize:
+            self.LeafSize = leafSize
+            self.Levels = []
+
+        levels = []
+        mins = maxs = vals      # the previous level
+        lo, hi = start, (n if stop is None else stop)
+        block = k = self.LeafSize
+        while True:
+            cnt = -(-len(mins) // k)
+            lo, hi = lo // k, min(-(-hi // k), cnt)
+
+            # the level did not exist, reduce all of it
+            if len(levels) >= len(self.Levels):
+                lo, hi = 0, cnt
+            newMins, newMaxs = reduce_minmax(mins[lo*k:hi*k], maxs[lo*k:hi*k], k)
+
+            if lo == 0 and hi == cnt:
+                levelMins, levelMaxs = newMins, newMaxs
+            else:
+                _, levelMins, levelMaxs = self.Levels[len(levels)]
+                if stop is None:
+                    levelMins = np.concatenate((levelMins[:lo], newMins))
+                    levelMaxs = np.concatenate((levelMaxs[:lo], newMaxs))
+                else:
+                    levelMins[lo:hi] = newMins
+                    levelMaxs[lo:hi] = newMaxs
+
+            levels.append((block, levelMins, levelMaxs))
+            if cnt <= 1:
+                break
+            mins, maxs = levelMins, levelMaxs
+            k = self.Factor
+            block *= k
+
+        self.Levels = levels
+
+    def extent(self):
+        '''
+            The offset range covered by the sequence.
+        '''
+        return 0, max(len(self.Vals) - 1, 0) * self.XStep
+
+    def query(self, x0, x1, pixels):
+        '''
+            Get the points to draw for the view range [x0, x1].
+            :param x0, x1: the view range in offset
+            :param pixels: the pixel width of the view
+            :return: x, y and a flag telling whether the raw values are returned
+        '''
+        n = len(self.Vals)
+        if n == 0:
+            return np.empty(0), np.empty(0), True
+
+        x0, x1 = x0 / self.XStep, x1 / self.XStep
+        lo = min(max(int(np.floor(x0)), 0), n - 1)
+        hi = max(min(int(np.ceil(x1)) + 1, n), lo + 1)
+        pixels = max(int(pixels), 1)
+
+        # few points are visible, raw values with one sample of margin
+        if hi - lo <= 2 * pixels or not self.Levels:
+            lo, hi = max(lo - 1, 0), min(hi + 1, n)
+            y = np.asarray(self.Vals[lo:hi])
+            y = y.astype(y.dtype.newbyteorder('='), copy=False)
+            x = shared_x((n, self.XStep, 1, lo, hi),
+                         lambda: self.x_with_endpoints(np.arange(lo, hi)))
+            return x, self.y_with_endpoints(y, lo > 0, hi < n), True
+
+        # finest level whose blocks fit the pixels
+        for block, mins, maxs in self.Levels:
+            if (hi - lo) / block <= pixels:
+                break
+
+        # an enlarged leaf is too coarse for the view, the blocks fitting the
+        # pixels are reduced from at most a leaf of raw values per pixel
+        if block == self.LeafSize and block > self.MinLeaf:
+            block = -(-(hi - lo) // pixels)
+            b0 = max(lo // block - 1, 0)
+            b1 = min(hi // block + 2, -(-n // block))
+            raw = self.Vals[b0 * block:b1 * block]
+            mins, maxs = reduce_minmax(raw, raw, block)
+            first = b0          # index of the first block in mins and maxs
+        else:
+            first = 0
+            # one block of margin on both sides
+            b0 = max(lo // block - 1, 0)
+            b1 = min(hi // block + 2, len(mins))
+
+        def build_x():
+            starts = np.arange(b0, b1) * block
+            x = np.empty(2 * (b1 - b0), dtype=np.int64)
+            x[0::2] = starts
+            x[1::2] = np.minimum(starts + block, n) - 1
+            return self.x_with_endpoints(x)
+
+        y = np.empty(2 * (b1 - b0), dtype=mins.dtype)
+        y[0::2] = mins[b0 - first:b1 - first]
+        y[1::2] = maxs[b0 - first:b1 - first]
+        x = shared_x((n, self.XStep, block, b0, b1), build_x)
+        return x, self.y_with_endpoints(y, b0 > 0, b1 * block < n), False
+
+    def x_with_endpoints(self, x):
+        '''
+            Keep the first and last samples in the points so that the data
+            bounds seen by the plot (auto range) are always the whole sequence,
+            x are converted from index to offset as well.
+        '''
+        n = len(self.Vals)
+        head, tail = x[0] > 0, x[-1] < n - 1
+        x = x * self.XStep
+        if head:
+            x = np.concatenate(([0], x))
+        if tail:
+            x = np.concatenate((x, [(n - 1) * self.XStep]))
+        return x
+
+    def y_with_endpoints(self, y, head, tail):
+        if head:
+            y = np.concatenate((self.Vals[:1], y))
+        if tail:
+            y = np.concatenate((y, self.Vals[-1:]))
+        return y
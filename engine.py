@@ -5,76 +5,538 @@
     to dispatch the interaction between components. Main function
     is also in this file. Moreover, class Engine contains some
     functions that will be used in MainWindow to load datas.
+
+    Loading and computing run in a background worker so that the
+    GUI never blocks, the results are handed back to the window
+    by signals. Opening another file cancels the loading one.
+    Loaded files are kept in a cache so that reopening is instant.
+    The derived series and statistics of large memory-mapped files are
+    computed by blocks into memory-mapped scratch files instead of
+    memory, and their pyramids are bounded by an enlarged leaf.
+
+    The pipeline is timed by the profiling module, and the trace of it
+    is saved at exit when "TraceFile" is set.
+
+    Changed configs are saved to the config file at once, and the
+    config file is watched so that editing it applies the changes
+    without restarting. A change of the loading configs reloads the
+    current file.
+
+    In follow mode, the loaded file is watched and the appended
+    words are read and plotted incrementally. In comparison mode,
+    other files are loaded concurrently and compared to the loaded
+    one.
+
+    Only the Qt core modules are imported at module level, the
+    window (with pyqtgraph) and the data modules (with NumPy) are
+    imported after the first file is chosen, so that the file
+    dialog shows up as soon as possible.
 '''
 
 from PyQt5 import QtWidgets as widgets
+from PyQt5 import QtCore as core
+import os
 import sys
+import tempfile
+import time
 
-from fileLoader import loading
-from window import MainWindow
+import profiling
 from config import CongfigManager
 from windowEventHandling import get_open_file_handler
-from compute import cal_differential, cal_integrate
+from worker import Worker
+
+# configs changing the loaded series
+LoadConfigs = ('MaxFileSize', 'MemoryMapped', 'WordType', 'WordBits', 'ByteOrder', 'WordOffset',
+               'WordStride', 'StatsWindow', 'StatsStep', 'OutOfCoreSize', 'IntegrateThreads')
 
-class Engine:
+class Engine(core.QObject):
     def __init__(self):
+        super(Engine, self).__init__()
         initInfo = widgets.QWidget()
 
+        path = self.choose_init_file()
+        if path == '':        # nothing selected, exit
+            exit(0)
+
         try:
-            self.Data = None
-            self.Names = ['Value', 'Differential', 'Integrate']
-            self.CfgManager = CongfigManager()
-            self.Datas = self.load_init()
-            self.Window = MainWindow('Chart', self.Names, self.CfgManager.readConfig, self.Datas, self.load)
+            # lazy import of GUI modules
+            from window import MainWindow
+            from cache import SeriesCache
+
+            self.Datas = None
+            self.Path = None
+            self.Worker = None
+            self.CompareWorker = None
+            self.Following = False
+            self.Follower = None
+            self.FollowWorker = None
+            self.StatNames = ['Entropy', 'Mean', 'Variance']        # sliding-window statistics
+            self.Names = ['Value', 'Differential', 'Integrate'] + self.StatNames
+            self.CfgManager = CongfigManager(autoSave=True)
+            self.Cache = SeriesCache(self.CfgManager.get('CacheBudget'),
+                                     self.CfgManager.get('CacheDir') if self.CfgManager.get('DiskCache') else None)
+            self.Window = MainWindow('Chart', self.Names, self.CfgManager.readConfig, {}, self.load,
+                                     self.set_follow, self.compare)
+
+            # file is polled both when it is changed and by timer, for the file
+            # systems whose changes are missed by the watcher
+            self.Watcher = core.QFileSystemWatcher(self)
+            self.Watcher.fileChanged.connect(self.follow_poll)
+            self.FollowTimer = core.QTimer(self)
+            self.FollowTimer.timeout.connect(self.follow_poll)
+
+            # several changed configs of loading reload the file once
+            self.ReloadTimer = core.QTimer(self)
+            self.ReloadTimer.setSingleShot(True)
+            self.ReloadTimer.timeout.connect(lambda: self.load(None))
+            self.CfgManager.readConfig.subscribe(self.config_changed)
+            self.CfgWatcher = core.QFileSystemWatcher(self)
+            if os.path.exists(self.CfgManager.ConfigPath):
+                self.CfgWatcher.addPath(self.CfgManager.ConfigPath)
+            self.CfgWatcher.fileChanged.connect(self.reload_config)
+            self.show_config_errors()
+
+            self.LoadStart = None
+            self.ScratchFiles = []          # scratch files not removed while mapped
+            widgets.QApplication.instance().aboutToQuit.connect(self.remove_scratch_files)
+            traceFile = self.CfgManager.get('TraceFile')
+            if traceFile:
+                profiling.enable_trace()
+                widgets.QApplication.instance().aboutToQuit.connect(lambda: profiling.save_trace(traceFile))
 
         # catch all unexpected exceptions and exit
         except:
             widgets.QMessageBox.information(initInfo, 'Message', "遇到了意料之外的错误，程序退出")
             exit(-1)
 
-    def load_init(self):
-        flag = True
+        self.load(path)
+
+    def choose_init_file(self):
         top = widgets.QWidget()
-        while flag:
-            path = get_open_file_handler(top, lambda x:x)()
-            if path == '':        # nothing selected, exit
-                exit(0)
-            datas = self.load(path, auto=False)
-            flag = (datas is None)
+        return get_open_file_handler(top, lambda x:x)()
 
-        return datas
+    def load(self, path):
+        '''
+            Start loading the file in a background worker, the worker loading
+            another file is cancelled. None path reloads the current file.
+        '''
+        if path is None:
+            path = self.Path
+        if not path:        # nothing selected
+            return
 
-    def load(self, path, auto=True):
-        top = widgets.QWidget()
+        loadConfig = self.read_load_config()
+        if loadConfig is None:
+            return
+        maxSize, mmap, fmt, stats = loadConfig
+
+        self.ReloadTimer.stop()
+        if self.Worker is not None:
+            self.Worker.cancel()
+        self.stop_follow()
+
+        self.LoadStart = time.perf_counter()
+        self.Worker = Worker(self.compute_datas, path, maxSize, mmap, fmt, stats)
+        self.Worker.Signals.Progress.connect(self.Window.show_progress)
+        self.Worker.Signals.Finished.connect(self.on_loaded)
+        self.Worker.Signals.Failed.connect(self.on_load_failed)
+        self.Window.show_progress(0)
+        self.Worker.start()
+
+    def config_changed(self, name, value):
+        '''
+            Apply a changed config item of loading, the items of display are
+            applied by the window.
+        '''
+        if name in LoadConfigs:
+            self.ReloadTimer.start(0)
+        elif name == 'FollowInterval':
+            if self.FollowTimer.isActive():
+                self.FollowTimer.start(value)
+        elif name == 'CacheBudget':
+            self.Cache.set_budget(value)
+        elif name in ('DiskCache', 'CacheDir'):
+            self.Cache.DiskDir = self.CfgManager.get('CacheDir') if self.CfgManager.get('DiskCache') else None
+
+    def reload_config(self, path):
+        '''
+            Apply the edited config file. The file is replaced when saved, so
+            the path is watched again.
+        '''
+        if path not in self.CfgWatcher.files() and os.path.exists(path):
+            self.CfgWatcher.addPath(path)
+        self.CfgManager.reload()
+        self.show_config_errors()
+
+    def show_config_errors(self):
+        if self.CfgManager.Errors:
+            self.Window.statusBar().showMessage('配置项非法，已使用默认值: ' +
+                                                ', '.join(str(k) for k, msg in self.CfgManager.Errors))
+
+    def read_load_config(self):
+        '''
+            Read the configs of loading: size limit, mapping mode, word format and
+            (window, step) of sliding statistics. None is returned when the word
+            format is not supported.
+        '''
+        from fileLoader import WordFormat
         try:
-            vals = loading(path, self.CfgManager.get('MaxFileSize'))
+            maxSize = self.CfgManager.get('MaxFileSize')
+            mmap = self.CfgManager.get('MemoryMapped')
+            fmt = WordFormat.from_config(self.CfgManager)
+            stats = (self.CfgManager.get('StatsWindow'), self.CfgManager.get('StatsStep'))
 
         # bad config
-        except AttributeError:
-            widgets.QMessageBox.information(top, 'Message',
+        except (AttributeError, KeyError):
+            widgets.QMessageBox.information(self.Window, 'Message',
                                             "使用了损坏的配置文件！")
             exit(-1)
 
-        # loading fails
+        # unsupported word format
         except ValueError as exc:
-            msg = str(exc)
-            widgets.QMessageBox.information(top, 'Message',
-                                            "%s，请选择其他文件！"%msg)
+            widgets.QMessageBox.information(self.Window, 'Message',
+                                            "%s，请修改字格式！"%str(exc))
+            return None
+
+        return maxSize, mmap, fmt, stats
+
+    def compute_datas(self, path, maxSize, mmap, fmt, stats, progress, cancelled):
+        '''
+            Loading and computing pipeline running in the worker thread, the
+            pyramids to plot are built here as well. None is returned when
+            the job is cancelled between two stages.
+
+            Files opened before are served by the cache, and the derived series
+            are read from the on-disk cache when it is enabled. "stats" is the
+            window size and step of sliding statistics.
+        '''
+        from fileLoader import read_buffer
+        from compute import cal_differential, cal_integrate_parallel, cal_chunked
+        from decimation import MinMaxPyramid
+        from slidingStats import sliding_stats, window_count
+
+        window, step = stats
+        try:
+            key = self.Cache.key(path, fmt, mmap, maxSize) + stats
+        except OSError:
+            raise ValueError('无法打开文件')
+        cached = self.Cache.get(key)
+        if cached is not None:
+            profiling.count('cache hits')
+            progress(100)
+            return (path,) + cached
+
+        # compressed files are decompressed with progress
+        with profiling.span('loading', path=path):
+            buffer = read_buffer(path, maxSize, mmap, self.CfgManager.get('ScratchDir'),
+                                 progress=lambda p: progress(20 * p // 100), cancelled=cancelled)
+        if buffer is None:
+            return None
+        if fmt.count(len(buffer)) == 0:
+            raise ValueError('文件为空')
+        vals = fmt.decode(buffer, len(buffer))
+        # trailing bytes less than a word are not decoded
+        tail = fmt.tail(len(buffer))
+        progress(20)
+        if cancelled():
+            return None
+
+        # out-of-core computing, the memory is bounded by the block size. The
+        # on-disk cache is not used since it loads the series into memory
+        outOfCore = mmap and vals.nbytes >= self.CfgManager.get('OutOfCoreSize') * 1024 * 1024
+        derived = None if outOfCore else self.Cache.load_derived(key)
+        if derived is None:
+            if outOfCore:
+                paths = []
+                try:
+                    paths = [self.scratch_path(), self.scratch_path()]
+                    with profiling.span('chunked'):
+                        result = cal_chunked(vals, *paths, progress=lambda p: progress(20 + 30 * p // 100),
+                                             cancelled=cancelled)
+                except OSError:
+                    raise ValueError('无法写入临时文件')
+                finally:
+                    self.release_scratch_files(paths)
+                if result is None:
+                    return None
+                diffs, ints = result
+
+            else:
+                with profiling.span('differential'):
+                    diffs = cal_differential(vals)
+                progress(40)
+                if cancelled():
+                    return None
+
+                with profiling.span('integrate'):
+                    ints = cal_integrate_parallel(vals, threads=self.CfgManager.get('IntegrateThreads'))
+                progress(50)
+                if cancelled():
+                    return None
+
+            derived = {name:val for name,val in zip(self.Names[1:3], [diffs,ints])}
+            statsProgress = lambda p: progress(50 + 10 * p // 100)
+            with profiling.span('stats'):
+                if outOfCore:
+                    # statistics are written by chunks of windows to scratch files
+                    from numpy.lib.format import open_memmap
+                    paths = []
+                    try:
+                        paths = [self.scratch_path() for _ in self.StatNames]
+                        nwin = window_count(len(vals), window, step)
+                        out = {name:open_memmap(path, mode='w+', dtype='f8', shape=(nwin,))
+                               for name, path in zip(self.StatNames, paths)}
+                        stats = sliding_stats(vals, window, step, out, statsProgress, cancelled)
+                    except OSError:
+                        raise ValueError('无法写入临时文件')
+                    finally:
+                        self.release_scratch_files(paths)
+                else:
+                    stats = sliding_stats(vals, window, step, progress=statsProgress, cancelled=cancelled)
+            if stats is None:
+                return None
+            derived.update(stats)
+            if not outOfCore:
+                self.Cache.save_derived(key, derived)
+        progress(60)
+        if cancelled():
             return None
 
-        diffs = cal_differential(vals)
-        ints = cal_integrate(vals)
+        datas = {self.Names[0]: vals}
+        datas.update(derived)
+        pyramids = {}
+        for name in self.Names:
+            xStep = step if name in self.StatNames else 1
+            with profiling.span('pyramid', plot=name):
+                pyramids[name] = MinMaxPyramid(datas[name], xStep=xStep)
+            if cancelled():
+                return None
+        progress(100)
+
+        self.Cache.put(key, datas, pyramids, tail)
+        return path, datas, pyramids, tail
+
+    def scratch_path(self):
+        fd, path = tempfile.mkstemp(suffix='.npy', prefix='chart-', dir=self.CfgManager.get('ScratchDir') or None)
+        os.close(fd)
+        return path
+
+    def release_scratch_files(self, paths):
+        '''
+            Remove the mapped scratch files, the mappings keep their data until the
+            arrays are freed. The files failing to be removed (mapped files can not
+            be removed on Windows) are removed at exit.
+        '''
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                self.ScratchFiles.append(path)
+
+    def remove_scratch_files(self):
+        for path in self.ScratchFiles:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def on_loaded(self, result):
+        # result of a replaced worker
+        if self.sender() is not self.Worker.Signals:
+            return
+
+        path, datas, pyramids, tail = result
+        self.Window.load_datas(datas, pyramids, self.Worker.Args[3])
+        # update data in engine
+        self.Path = path
+        self.Datas = datas
+
+        if tail:
+            self.Window.statusBar().showMessage('末尾的 %d 个字节不足一个字，已忽略' % tail)
+
+        # from choosing the file to the datas being plotted
+        profiling.add('load', self.LoadStart, time.perf_counter() - self.LoadStart, {'path': path})
+
+        if self.Following:
+            self.start_follow()
+
+    def on_load_failed(self, msg):
+        if self.sender() is not self.Worker.Signals:
+            return
+
+        self.Window.show_progress(None)
+        widgets.QMessageBox.information(self.Window, 'Message',
+                                        "%s，请选择其他文件！"%msg)
+
+        # nothing loaded yet, the first file must be chosen again
+        if self.Datas is None:
+            path = self.choose_init_file()
+            if path == '':
+                widgets.QApplication.quit()
+            else:
+                self.load(path)
+
+    def compare(self, paths):
+        '''
+            Load the files concurrently in a background worker and compare them
+            to the loaded file, the results are overlaid in the window.
+        '''
+        if not paths or self.Datas is None:
+            return
+
+        loadConfig = self.read_load_config()
+        if loadConfig is None:
+            return
+        maxSize, mmap, fmt, _ = loadConfig
+
+        if self.CompareWorker is not None:
+            self.CompareWorker.cancel()
+        self.CompareWorker = Worker(self.compare_datas, paths, self.Datas['Value'], maxSize, mmap, fmt)
+        self.CompareWorker.Signals.Progress.connect(self.Window.show_progress)
+        self.CompareWorker.Signals.Finished.connect(self.on_compared)
+        self.CompareWorker.Signals.Failed.connect(self.on_compare_failed)
+        self.Window.show_progress(0)
+        self.CompareWorker.start()
+
+    def compare_datas(self, paths, ref, maxSize, mmap, fmt, progress, cancelled):
+        '''
+            Comparing pipeline running in the worker thread, files are loaded and
+            compared by a thread pool (NumPy releases the GIL while computing).
+        '''
+        from concurrent.futures import ThreadPoolExecutor
+        from fileLoader import loading
+        from decimation import MinMaxPyramid
+        from comparison import compare_values
+
+        outOfCoreSize = self.CfgManager.get('OutOfCoreSize') * 1024 * 1024
+
+        def compare_one(path):
+            try:
+                vals = loading(path, maxSize, mmap=mmap, fmt=fmt, scratchDir=self.CfgManager.get('ScratchDir'))
+            except ValueError as exc:
+                raise ValueError('%s: %s' % (os.path.basename(path), str(exc)))
+
+            # the difference (8 bytes per value) of large mapped files is written
+            # to a scratch file like the other derived series
+            paths = []
+            try:
+                if mmap and min(len(ref), len(vals)) * 8 >= outOfCoreSize:
+                    paths = [self.scratch_path()]
+                result = compare_values(ref, vals, *paths)
+            except OSError:
+                raise ValueError('无法写入临时文件')
+            finally:
+                self.release_scratch_files(paths)
+            return path, vals, MinMaxPyramid(vals), result
+
+        results = []
+        with ThreadPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as executor:
+            for result in executor.map(compare_one, paths):
+                results.append(result)
+                progress(100 * len(results) // len(paths))
+                if cancelled():
+                    return None
+        return results
+
+    def on_compared(self, results):
+        if self.sender() is not self.CompareWorker.Signals:
+            return
+        self.Window.show_progress(None)
+        self.Window.set_comparisons(results)
+
+    def on_compare_failed(self, msg):
+        if self.sender() is not self.CompareWorker.Signals:
+            return
+        self.Window.show_progress(None)
+        widgets.QMessageBox.information(self.Window, 'Message', "%s，无法比较！"%msg)
+
+    def set_follow(self, enabled):
+        '''
+            Switch the follow mode of the loaded file.
+        '''
+        self.Following = enabled
+        self.stop_follow()
+        if enabled and self.Datas is not None:
+            self.start_follow()
+
+    def start_follow(self):
+        from follower import FileFollower
+        from fileLoader import compression_of
+
+        _, _, mmap, fmt, stats = self.Worker.Args
+        # compressed files can not be read incrementally
+        try:
+            if compression_of(self.Path) is not None:
+                self.Window.statusBar().showMessage('压缩文件不支持跟踪模式')
+                return
+        except OSError:
+            return
+        try:
+            self.Follower = FileFollower(self.Path, fmt, mmap, stats, self.Datas,
+                                         (self.scratch_path, self.release_scratch_files))
+        except OSError:
+            return
+        self.Watcher.addPath(self.Path)
+        self.FollowTimer.start(self.CfgManager.get('FollowInterval'))
+
+    def stop_follow(self):
+        self.Follower = None
+        if self.FollowWorker is not None:
+            self.FollowWorker.cancel()
+            self.FollowWorker = None
+        self.FollowTimer.stop()
+        if self.Watcher.files():
+            self.Watcher.removePaths(self.Watcher.files())
+
+    def follow_poll(self, *args):
+        '''
+            Read the words appended to the followed file in a background worker,
+            the polls while one is running are skipped.
+        '''
+        if self.Follower is None or self.FollowWorker is not None:
+            return
+
+        # the watcher forgets the file replaced by a new one
+        if self.Path not in self.Watcher.files() and os.path.exists(self.Path):
+            self.Watcher.addPath(self.Path)
+
+        follower = self.Follower
+        self.FollowWorker = Worker(lambda progress, cancelled: follower.poll())
+        self.FollowWorker.Signals.Finished.connect(self.on_followed)
+        self.FollowWorker.Signals.Failed.connect(self.on_follow_failed)
+        self.FollowWorker.start()
+
+    def on_followed(self, result):
+        '''
+            Plot the words appended to the followed file.
+        '''
+        if self.FollowWorker is None or self.sender() is not self.FollowWorker.Signals:
+            return
+        self.FollowWorker = None
+        if result is None:
+            return
+        datas, starts = result
+        self.Window.update_datas(datas, starts)
+        self.Datas = datas
 
-        datas = {name:val for name,val in zip(self.Names, [vals,diffs,ints])}
+    def on_follow_failed(self, msg):
+        if self.FollowWorker is None or self.sender() is not self.FollowWorker.Signals:
+            return
+        self.FollowWorker = None
+        # truncated or removed file, load it again
+        self.load(None)
 
-        if auto:
-            self.Window.load_datas(datas)
-            # update data in engine
-            self.Datas = datas
-        else:
-            return datas
+def setup_render_backend(backend):
+    '''
+        Software OpenGL (Mesa) must be chosen before QApplication is created,
+        the other rendering options are set by MainWindow.
+    '''
+    if backend == 'software':
+        os.environ.setdefault('LIBGL_ALWAYS_SOFTWARE', '1')
+        core.QCoreApplication.setAttribute(core.Qt.AA_UseSoftwareOpenGL)
 
 if __name__ == '__main__':
+    setup_render_backend(CongfigManager().get('RenderBackend'))
     app = widgets.QApplication(sys.argv)
     e = Engine()
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
@@ -0,0 +1,135 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    This module exports the series (Value, Differential and Integrate)
+    to files. The format is decided by the extension of path:
+    - .npy: one array of records, a field for each series
+    - .npz: compressed, one array for each series
+    - .csv: a column of offset followed by a column for each series
+    - .bin / .raw: the records of .npy without header (packed, native
+      byte order)
+
+    Series are written chunk by chunk into the file, only one chunk of
+    them is read into memory at a time, so exporting a memory-mapped
+    file never loads the whole file nor copies the whole series. An
+    index range [start, stop) can be exported instead of the whole
+    series.
+'''
+
+import os
+import zipfile
+
+import numpy as np
+
+ChunkSize = 1 << 20         # count of samples written at a time
+Formats = {'.npy': 'npy', '.npz': 'npz', '.csv': 'csv', '.bin': 'raw', '.raw': 'raw'}
+
+def format_of(path):
+    fmt = Formats.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError('不支持的导出格式')
+    return fmt
+
+def native(dtype):
+    return dtype.newbyteorder('=')
+
+def record_dtype(datas):
+    return np.dtype([(name, native(d.dtype)) for name, d in datas.items()])
+
+def npy_header(f, dtype, count):
+    np.lib.format.write_array_header_1_0(f, {'descr': np.lib.format.dtype_to_descr(dtype),
+                                             'fortran_order': False, 'shape': (count,)})
+
+def iter_chunks(datas, start, stop, chunk):
+    '''
+        Yield the offset of each chunk and the slices of the series in it.
+    '''
+    for c0 in range(start, stop, chunk):
+        c1 = min(c0 + chunk, stop)
+        yield c0, {name: d[c0:c1] for name, d in datas.items()}
+
+def to_records(dtype, chunk):
+    records = np.empty(len(chunk[dtype.names[0]]), dtype=dtype)
+    for name, vals in chunk.items():
+        records[name] = vals
+    return records
+
+def csv_fmt(datas):
+    return ['%d'] + ['%.17g' if d.dtype.kind == 'f' else '%d' for d in datas.values()]
+
+def export_series(path, datas, start=0, stop=None, chunk=ChunkSize, progress=None, cancelled=None):
+    '''
+        Export the series of equal length to the file, by the format of the
+        extension of path.
+        :param datas: the series to export by name, in the order of columns
+        :param start, stop: the index range to export, None stop for the end
+        :param progress, cancelled: callbacks of Worker, the partial file is
+                removed when cancelled
+        :return: the path, or None if cancelled
+    '''
+    fmt = format_of(path)
+    n = len(next(iter(datas.values())))
+    stop = n if stop is None else min(stop, n)
+    start = min(max(start, 0), stop)
+    total = max(stop - start, 1)
+
+    def step(c0, c1):
+        if progress is not None:
+            progress(100 * (c1 - start) // total)
+        return cancelled is not None and cancelled()
+
+    try:
+        if fmt == 'npz':
+            done = write_npz(path, datas, start, stop, chunk, step)
+        else:
+            with open(path, 'wb') as f:
+                if fmt == 'csv':
+                    done = write_csv(f, datas, start, stop, chunk, step)
+                else:
+                    done = write_records(f, datas, start, stop, chunk, step, header=fmt == 'npy')
+    except OSError:
+        raise ValueError('无法写入文件')
+
+    if not done:
+        os.remove(path)
+        return None
+    return path
+
+def write_records(f, datas, start, stop, chunk, step, header):
+    dtype = record_dtype(datas)
+    if header:
+        npy_header(f, dtype, stop - start)
+    for c0, vals in iter_chunks(datas, start, stop, chunk):
+        f.write(to_records(dtype, vals).tobytes())
+        if step(c0, c0 + len(vals[dtype.names[0]])):
+            return False
+    return True
+
+def write_npz(path, datas, start, stop, chunk, step):
+    # each series is streamed into its own member, like numpy.savez_compressed
+    total = len(datas) * (stop - start)
+    done = 0
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        for name, d in datas.items():
+            with zf.open(name + '.npy', 'w', force_zip64=True) as f:
+                npy_header(f, native(d.dtype), stop - start)
+                for c0 in range(start, stop, chunk):
+                    c1 = min(c0 + chunk, stop)
+                    f.write(np.asarray(d[c0:c1], dtype=native(d.dtype)).tobytes())
+                    done += c1 - c0
+                    # progress is over all the series
+                    if step(start, start + done * (stop - start) // max(total, 1)):
+                        return False
+    return True
+
+def write_csv(f, datas, start, stop, chunk, step):
+    fmt = csv_fmt(datas)
+    dtype = np.dtype([('Offset', np.int64)] + record_dtype(datas).descr)
+    f.write((','.join(dtype.names) + '\n').encode())
+    for c0, vals in iter_chunks(datas, start, stop, chunk):
+        cnt = len(next(iter(vals.values())))
+        records = to_records(dtype, dict(Offset=np.arange(c0, c0 + cnt), **vals))
+        np.savetxt(f, records, fmt=fmt, delimiter=',')
+        if step(c0, c0 + cnt):
+            return False
+    return True
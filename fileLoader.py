@@ -4,27 +4,248 @@
     This module is for loading a file in binary and convert it to a sequence of
     numbers by extract several bits to decimal without overlapping.
 
-    The window size of bits is fixed to 16 (means short).
+    The format of words is described by WordFormat: signed, unsigned or float
+    words of 8/16/32/64 bits in little, big or native byte order, starting at an
+    offset and separated by a stride (by byte). The default format is native
+    16 bits signed words (means short) without offset and stride.
+
+    Files can either be read into memory entirely or be mapped into memory
+    by np.memmap. A mapped file is a lazy read-only view of the disk content
+    so that huge files (firmware images, memory dumps) can be opened without
+    a full copy, and the size limit only applies to the in-memory mode. In
+    both modes, words are decoded by a view with the dtype of the format, no
+    conversion is done per element.
+
+    Compressed files (gzip, bz2, xz and members of zip archives) are
+    detected by their extensions and magic bytes, and decompressed by streamed chunks,
+    into a growing buffer in the in-memory mode (the size limit applies
+    to the decompressed length) or into a temporary file which is then
+    mapped. A zip member is given by "archive.zip!member", the first
+    member is used when it is not given.
 
     Any errors occured will not be processed inside and errors should be
     identified and processed outside this module to offer useful tips.
 '''
 
+from contextlib import ExitStack
+import bz2
+import gzip
+import lzma
 import os
+import tempfile
+import zipfile
+
 import numpy as np
 
-def loading(pth, maxSize):
+ReadChunk = 1 << 22         # decompressed bytes read at a time
+MemberSep = '!'             # separator of zip archive and member in path
+Magics = {'gzip': b'\x1f\x8b', 'bz2': b'BZh', 'xz': b'\xfd7zXZ\x00', 'zip': b'PK\x03\x04'}
+Extensions = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz', '.zip': 'zip'}
+
+class WordFormat:
+    '''
+        Format of words in a file, decoded to a NumPy dtype.
+    '''
+    Kinds = {'int': 'i', 'uint': 'u', 'float': 'f'}
+    Orders = {'native': '=', 'little': '<', 'big': '>'}
+    Bits = {'int': (8, 16, 32, 64), 'uint': (8, 16, 32, 64), 'float': (16, 32, 64)}
+
+    def __init__(self, kind='int', bits=16, order='native', offset=0, stride=0):
+        '''
+            :param kind: 'int', 'uint' or 'float'
+            :param bits: bit width of a word
+            :param order: byte order, 'native', 'little' or 'big'
+            :param offset: bytes skipped at the beginning of file
+            :param stride: bytes between two successive words, 0 means the
+                    words are packed
+        '''
+        if kind not in self.Kinds or bits not in self.Bits[kind] or order not in self.Orders:
+            raise ValueError('不支持的字格式')
+
+        self.Dtype = np.dtype('%s%s%d' % (self.Orders[order], self.Kinds[kind], bits // 8))
+        if offset < 0 or (stride != 0 and stride < self.Dtype.itemsize):
+            raise ValueError('不支持的字格式')
+
+        self.Kind = kind
+        self.Bits = bits
+        self.Order = order
+        self.Offset = offset
+        self.Stride = stride
+
+    @classmethod
+    def from_config(cls, cfg):
+        '''
+            Read the format from a config which offers "get" like CongfigManager.
+        '''
+        return cls(cfg.get('WordType'), cfg.get('WordBits'), cfg.get('ByteOrder'),
+                   cfg.get('WordOffset'), cfg.get('WordStride'))
+
+    def step(self):
+        return self.Stride or self.Dtype.itemsize
+
+    def count(self, size):
+        '''
+            Count of complete words in a file of "size" bytes.
+        '''
+        if size - self.Offset < self.Dtype.itemsize:
+            return 0
+        return (size - self.Offset - self.Dtype.itemsize) // self.step() + 1
+
+    def tail(self, size):
+        '''
+            Count of trailing bytes not decoded, which are less than a word
+            (or a stride).
+        '''
+        return max(size - self.Offset - self.count(size) * self.step(), 0)
+
+    def decode(self, buffer, size):
+        '''
+            View the buffer of a file as words without copying.
+        '''
+        return np.ndarray(shape=(self.count(size),), dtype=self.Dtype, buffer=buffer,
+                          offset=self.Offset, strides=(self.step(),))
+
+def split_member(pth):
+    '''
+        Split the path into the file on disk and the zip member (None if not
+        given). Existing files are never split.
+    '''
+    if MemberSep in pth and not os.path.exists(pth):
+        archive, _, member = pth.partition(MemberSep)
+        return archive, member
+    return pth, None
 
-    if os.path. os.path.getsize(pth)/1024 > maxSize:
+def compression_of(pth):
+    '''
+        Compression of the file on disk by its extension, None for raw files. The
+        magic bytes must match the extension, otherwise the file is raw.
+    '''
+    archive = split_member(pth)[0]
+    kind = Extensions.get(os.path.splitext(archive)[1].lower())
+    with open(archive, 'rb') as f:
+        head = f.read(8)
+    return kind if kind is not None and head.startswith(Magics[kind]) else None
+
+def open_stream(pth, kind, stack):
+    '''
+        Open the decompressed stream of the file, closed by the exit stack.
+        :return: the stream, a function giving the fraction read, and the
+                decompressed size (None if unknown)
+    '''
+    archive, member = split_member(pth)
+    if kind == 'zip':
+        zf = stack.enter_context(zipfile.ZipFile(archive))
+        infos = [info for info in zf.infolist() if not info.is_dir()]
+        info = zf.getinfo(member) if member else infos[0]
+        stream = stack.enter_context(zf.open(info))
+        return stream, lambda done: done / max(info.file_size, 1), info.file_size
+
+    raw = stack.enter_context(open(archive, 'rb'))
+    total = max(os.path.getsize(archive), 1)
+    opener = {'gzip': gzip.GzipFile, 'bz2': bz2.BZ2File, 'xz': lzma.LZMAFile}[kind]
+    stream = stack.enter_context(opener(fileobj=raw) if kind == 'gzip' else opener(raw))
+    return stream, lambda done: raw.tell() / total, None
+
+def decompress(pth, kind, maxBytes, mmap, scratchDir=None, progress=None, cancelled=None):
+    '''
+        Decompress the file by chunks into a byte array, None if cancelled.
+        :param maxBytes: limit of the decompressed size, ignored when mapping
+        :param mmap: decompress into a temporary file and map it
+    '''
+    with ExitStack() as stack:
+        stream, fraction, hint = open_stream(pth, kind, stack)
+        if hint is not None and not mmap and hint > maxBytes:
+            raise ValueError('文件过大')
+
+        if mmap:
+            # the mapping keeps the data of the removed temporary file
+            tmp = stack.enter_context(tempfile.TemporaryFile(dir=scratchDir or None))
+            size = 0
+            while True:
+                chunk = stream.read(ReadChunk)
+                if not chunk:
+                    break
+                tmp.write(chunk)
+                size += len(chunk)
+                if progress is not None:
+                    progress(int(100 * fraction(size)))
+                if cancelled is not None and cancelled():
+                    return None
+            tmp.flush()
+            if size == 0:
+                return np.empty(0, dtype=np.uint8)
+            return np.memmap(tmp, dtype=np.uint8, mode='r', shape=(size,))
+
+        # one more byte than the limit tells whether the file is too large
+        buffer = np.empty(min(hint if hint is not None else ReadChunk, maxBytes) + 1, dtype=np.uint8)
+        size = 0
+        while True:
+            if size == len(buffer):
+                if size > maxBytes:
+                    raise ValueError('文件过大')
+                grown = np.empty(min(2 * len(buffer), maxBytes + 1), dtype=np.uint8)
+                grown[:size] = buffer
+                buffer = grown
+            n = stream.readinto(memoryview(buffer)[size:])
+            if not n:
+                break
+            size += n
+            if progress is not None:
+                progress(int(100 * fraction(size)))
+            if cancelled is not None and cancelled():
+                return None
+        return buffer[:size]
+
+def read_buffer(pth, maxSize, mmap=False, scratchDir=None, progress=None, cancelled=None):
+    '''
+        Read the bytes of the file, decompressed if it is compressed.
+        :param maxSize: size limit of the file (decompressed) by KB, ignored
+                when mapping
+        :param scratchDir: directory of the temporary file decompressed for
+                mapping, None for the system temp
+        :param progress, cancelled: callbacks of Worker, progress is by percent
+        :return: the byte array, or None if cancelled
+    '''
+    try:
+        kind = compression_of(pth)
+    except OSError:
+        raise ValueError('无法打开文件')
+
+    if kind is not None:
+        try:
+            return decompress(pth, kind, int(maxSize * 1024), mmap, scratchDir, progress, cancelled)
+        except (OSError, EOFError, lzma.LZMAError, zipfile.BadZipFile, KeyError, IndexError):
+            raise ValueError('无法解压文件')
+
+    size = os.path.getsize(pth)
+    if not mmap and size/1024 > maxSize:
         raise ValueError('文件过大')
-    elif os.path. os.path.getsize(pth)/1024 == 0:
-        raise ValueError('文件为空')
+    elif size == 0:
+        return np.empty(0, dtype=np.uint8)
     try:
-        with open(pth, 'rb') as reader:
-            file = np.fromfile(reader, dtype=np.int16)
-            return file
-    except:
+        if mmap:
+            return np.memmap(pth, dtype=np.uint8, mode='r', shape=(size,))
+        else:
+            with open(pth, 'rb') as reader:
+                return np.fromfile(reader, dtype=np.uint8)
+    except (OSError, ValueError):
         # print("Unknow error occurs when loading the file: %s" % pth)       # read fails
         raise ValueError('无法打开文件')
 
-
+def loading(pth, maxSize, mmap=False, fmt=None, scratchDir=None, progress=None, cancelled=None):
+    '''
+        Load the file as a sequence of words.
+        :param pth: path of the file, "archive.zip!member" for a zip member
+        :param maxSize: size limit of the file by KB, ignored when mapping
+        :param mmap: map the file into memory instead of reading it, the
+                returned value is a read-only view of the mapped file
+        :param fmt: the WordFormat of the file, default to 16 bits signed words
+        :return: the words, or None if cancelled (see "read_buffer")
+    '''
+    fmt = fmt or WordFormat()
+    buffer = read_buffer(pth, maxSize, mmap, scratchDir, progress, cancelled)
+    if buffer is None:
+        return None
+    elif fmt.count(len(buffer)) == 0:
+        raise ValueError('文件为空')
+    return fmt.decode(buffer, len(buffer))
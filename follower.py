@@ -0,0 +1,189 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    Follow mode of a growing file (such as a capture still being written).
+
+    A FileFollower keeps the series of a loaded file and, when polled,
+    reads only the bytes appended since the last poll. The derived series
+    are extended incrementally: the integrate values carry on from the last
+    cumulative value, the differential values start from the last sample,
+    and only the new complete sliding windows are computed.
+
+    Series computed in memory are kept in growing buffers so that appending
+    costs amortized O(new values). Series in memory-mapped scratch files
+    (of the files computed out of core) are kept in growing scratch files,
+    which are extended and mapped again, so they never come into memory.
+    A memory-mapped file is simply mapped again with the new size, which
+    copies nothing. The buffers are made at the first poll reading new
+    words, so that polling can run in a worker thread.
+
+    Watching the file is left to the caller, this module knows nothing
+    about Qt.
+'''
+
+import os
+import numpy as np
+
+ChunkSize = 1 << 22         # values copied at a time into a scratch file
+
+from compute import cal_differential, cal_integrate
+from slidingStats import window_count, sliding_stats
+
+class SeriesBuffer:
+    '''
+        Growing buffer of a series, the capacity is doubled when it is full.
+    '''
+    def __init__(self, init):
+        self.Data = np.empty(max(len(init) * 2, 1024), dtype=init.dtype.newbyteorder('='))
+        self.Data[:len(init)] = init
+        self.Size = len(init)
+
+    def append(self, vals):
+        need = self.Size + len(vals)
+        if need > len(self.Data):
+            data = np.empty(max(need, len(self.Data) * 2), dtype=self.Data.dtype)
+            data[:self.Size] = self.Data[:self.Size]
+            self.Data = data
+        self.Data[self.Size:need] = vals
+        self.Size = need
+
+    def view(self):
+        return self.Data[:self.Size]
+
+class MappedBuffer:
+    '''
+        Growing buffer of a series in a scratch file, the capacity is doubled
+        when it is full by extending the file and mapping it again. Former
+        mappings stay valid, so the views given out are never invalidated.
+    '''
+    def __init__(self, init, path, release):
+        '''
+            :param path: the scratch file, which is given to "release" once it
+                    is opened
+        '''
+        self.File = open(path, 'w+b')
+        release([path])
+        self.Data = np.empty(0, dtype=init.dtype.newbyteorder('='))
+        self.Size = 0
+        self.reserve(max(len(init) * 2, 1024))
+        for c0 in range(0, len(init), ChunkSize):
+            c1 = min(c0 + ChunkSize, len(init))
+            self.Data[c0:c1] = init[c0:c1]
+        self.Size = len(init)
+
+    def reserve(self, capacity):
+        self.File.truncate(capacity * self.Data.dtype.itemsize)
+        self.Data = np.memmap(self.File, dtype=self.Data.dtype, mode='r+', shape=(capacity,))
+
+    def append(self, vals):
+        need = self.Size + len(vals)
+        if need > len(self.Data):
+            self.reserve(max(need, len(self.Data) * 2))
+        self.Data[self.Size:need] = vals
+        self.Size = need
+
+    def view(self):
+        return self.Data[:self.Size]
+
+class FileFollower:
+
+    def __init__(self, path, fmt, mmap, stats, datas, scratch=None):
+        '''
+            :param path: path of the followed file
+            :param fmt: WordFormat of the file
+            :param mmap: whether the file is memory-mapped
+            :param stats: (window, step) of sliding statistics
+            :param datas: the series loaded, keyed by plot name
+            :param scratch: (function giving a new scratch path, function
+                    releasing the paths opened) to keep the memory-mapped
+                    series in scratch files, None to keep them in memory
+        '''
+        self.Path = path
+        self.Fmt = fmt
+        self.Mmap = mmap
+        self.Window, self.Step = stats
+        self.Size = os.path.getsize(path)
+        self.Count = len(datas['Value'])
+        self.Datas = datas
+        self.Scratch = scratch
+
+        self.Value = datas['Value']
+        self.Buffers = None         # made at the first poll reading new words
+
+    def make_buffers(self):
+        '''
+            Move the series into growing buffers, the memory-mapped ones are
+            copied by chunks into scratch files.
+        '''
+        if not self.Mmap:
+            self.Value = SeriesBuffer(self.Value)
+        self.Buffers = {}
+        for name, vals in self.Datas.items():
+            if name == 'Value':
+                continue
+            if isinstance(vals, np.memmap) and self.Scratch is not None:
+                newPath, release = self.Scratch
+                self.Buffers[name] = MappedBuffer(vals, newPath(), release)
+            else:
+                self.Buffers[name] = SeriesBuffer(vals)
+
+    def values(self):
+        return self.Value if self.Mmap else self.Value.view()
+
+    def read_values(self, size, count):
+        '''
+            Decode the words in the file of "size" bytes, only the new words
+            are read when the file is not memory-mapped.
+        '''
+        if self.Mmap:
+            self.Value = self.Fmt.decode(np.memmap(self.Path, dtype=np.uint8, mode='r', shape=(size,)), size)
+            return
+
+        fmt = self.Fmt
+        step = fmt.step()
+        newCount = count - self.Count
+        with open(self.Path, 'rb') as reader:
+            reader.seek(fmt.Offset + self.Count * step)
+            buffer = np.fromfile(reader, dtype=np.uint8, count=(newCount - 1) * step + fmt.Dtype.itemsize)
+        self.Value.append(np.ndarray(shape=(newCount,), dtype=fmt.Dtype, buffer=buffer, strides=(step,)))
+
+    def poll(self):
+        '''
+            Read the appended words and extend the series.
+            :return: None if no new word, otherwise the series keyed by plot
+                    name and the first new index of each series
+        '''
+        try:
+            size = os.path.getsize(self.Path)
+        except OSError:
+            raise ValueError('无法打开文件')
+        if size < self.Size:
+            raise ValueError('文件被截断')
+
+        self.Size = size
+        count = self.Fmt.count(size)
+        if count <= self.Count:
+            return None
+
+        if self.Buffers is None:
+            self.make_buffers()
+        oldCount = self.Count
+        self.read_values(size, count)
+        self.Count = count
+        vals = self.values()
+        newVals = vals[oldCount:]
+
+        integrate = self.Buffers['Integrate']
+        self.Buffers['Differential'].append(cal_differential(newVals, prev=vals[oldCount - 1]))
+        integrate.append(cal_integrate(newVals, start=integrate.view()[-1]))
+        starts = {'Value': oldCount, 'Differential': oldCount, 'Integrate': oldCount}
+
+        # only the windows not complete before are computed
+        oldWindows = window_count(oldCount, self.Window, self.Step)
+        for name, stat in sliding_stats(vals[oldWindows * self.Step:], self.Window, self.Step).items():
+            self.Buffers[name].append(stat)
+            starts[name] = oldWindows
+
+        datas = {'Value': vals}
+        datas.update({name: buffer.view() for name, buffer in self.Buffers.items()})
+        return datas, starts
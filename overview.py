@@ -0,0 +1,101 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    Whole-file overview of the values as a 2D image, drawn by one
+    image item instead of millions of line points.
+
+    The values are reduced to at most a given count of pixels, each
+    pixel is the mean of a bin of successive values. The pixels are
+    laid out by rows of a fixed width, or along a Hilbert curve which
+    keeps the close offsets close in the image, so that the structures
+    of a file are seen as regions.
+
+    Reduction is a reshape and mean by chunks of bins, and the Hilbert
+    layout is computed for all pixels at once by vectorized bit
+    operations, there is no work per value in Python.
+'''
+
+import numpy as np
+
+ChunkSize = 1 << 22         # values reduced at a time
+
+def pixel_values(vals, binSize, chunk=ChunkSize):
+    '''
+        Mean of each bin of "binSize" successive values, the last bin may be
+        shorter.
+    '''
+    n = len(vals)
+    out = np.empty(-(-n // binSize))
+    step = max(chunk // binSize, 1) * binSize
+    for s0 in range(0, n, step):
+        block = vals[s0:s0 + step]
+        full = len(block) // binSize * binSize
+        p0 = s0 // binSize
+        if full:
+            out[p0:p0 + full // binSize] = block[:full].reshape(-1, binSize).mean(axis=1)
+        if full < len(block):
+            out[p0 + full // binSize] = block[full:].mean()
+    return out
+
+def hilbert_d2xy(order, d):
+    '''
+        Coordinates of the indices along the Hilbert curve filling a square of
+        side 2**order.
+    '''
+    t = np.array(d, dtype=np.int64)
+    x = np.zeros_like(t)
+    y = np.zeros_like(t)
+    s = 1
+    while s < (1 << order):
+        rx = 1 & (t // 2)
+        ry = 1 & (t ^ rx)
+        # rotate the quadrant
+        swap = ry == 0
+        flip = swap & (rx == 1)
+        x = np.where(flip, s - 1 - x, x)
+        y = np.where(flip, s - 1 - y, y)
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        x += s * rx
+        y += s * ry
+        t //= 4
+        s *= 2
+    return x, y
+
+class Overview:
+    '''
+        The image of values and the mapping from pixels back to offsets. The
+        image is indexed by [x, y] as pyqtgraph, empty pixels are NaN.
+    '''
+    def __init__(self, vals, width=256, maxPixels=1 << 20, hilbert=False):
+        n = len(vals)
+        self.Size = n
+        self.Bin = max(-(-n // maxPixels), 1)          # values of a pixel
+        pixels = pixel_values(vals, self.Bin) if n else np.empty(0)
+        self.Hilbert = hilbert
+
+        if hilbert:
+            order = int(np.ceil(np.log2(max(len(pixels), 1)) / 2))
+            side = 1 << order
+            x, y = hilbert_d2xy(order, np.arange(len(pixels)))
+            self.Image = np.full((side, side), np.nan)
+            self.Image[x, y] = pixels
+            # pixel index of each coordinate, for clicks
+            self.Index = np.full((side, side), -1, dtype=np.int64)
+            self.Index[x, y] = np.arange(len(pixels))
+        else:
+            self.Width = max(min(width, len(pixels)), 1)
+            rows = -(-len(pixels) // self.Width)
+            image = np.full(rows * self.Width, np.nan)
+            image[:len(pixels)] = pixels
+            self.Image = image.reshape(rows, self.Width).T
+
+    def offset_at(self, x, y):
+        '''
+            Offset of the first value of the pixel at (x, y), None out of the image.
+        '''
+        x, y = int(np.floor(x)), int(np.floor(y))
+        if not (0 <= x < self.Image.shape[0] and 0 <= y < self.Image.shape[1]):
+            return None
+        pixel = self.Index[x, y] if self.Hilbert else y * self.Width + x
+        offset = int(pixel) * self.Bin
+        return offset if 0 <= pixel and offset < self.Size else None
@@ -0,0 +1,167 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    Statistics of a selected range of the values, updated while the
+    selection is dragged.
+
+    The values are cut into blocks of a fixed size and the tables of
+    blocks are built once: prefix sums of the values, of the block means
+    (shifted by the mean of all values) and their squares and of the
+    squared deviations within blocks, prefix byte histograms, and sparse
+    tables of the minimum and maximum of blocks. The variance is never
+    taken as E[x^2] - E[x]^2 of the raw values, the parts of a range are
+    combined by the parallel formula of Chan et al. instead, so that it
+    keeps its precision for values of large magnitude. A range is answered by the tables for the
+    whole blocks in it and by scanning the two partial blocks at its
+    ends, and the entropy is taken from the 256 counts of the histogram,
+    so each query costs O(block size) however large the range is.
+    The tables take about 2KB per block, so the blocks of large values
+    are enlarged to bound the count of them.
+
+    Statistics are the same as "slidingStats": entropy and histogram
+    are of the bytes of values (bits per byte).
+'''
+
+import numpy as np
+
+from slidingStats import acc_type, as_bytes, window_histograms
+
+BlockSize = 1024            # samples of a block
+MaxBlocks = 1 << 14         # blocks are enlarged above this count
+ChunkSize = 1 << 22         # samples tabulated at a time
+
+def sparse_table(vals, func):
+    '''
+        Levels of "func" (np.minimum or np.maximum) of 2**k successive values.
+    '''
+    levels = [vals]
+    while 2 ** len(levels) <= len(vals):
+        prev, half = levels[-1], 2 ** (len(levels) - 1)
+        levels.append(func(prev[:-half], prev[half:]))
+    return levels
+
+def moments(part):
+    '''
+        (count, mean, sum of squared deviations) of the values by two passes.
+    '''
+    mean = part.mean(dtype=np.float64)
+    return len(part), mean, float(np.square(part - mean).sum())
+
+def combine(a, b):
+    '''
+        Moments of the union of two parts (Chan et al.).
+    '''
+    (na, ma, m2a), (nb, mb, m2b) = a, b
+    n = na + nb
+    delta = mb - ma
+    return n, ma + delta * nb / n, m2a + m2b + delta * delta * na * nb / n
+
+def table_query(levels, func, k0, k1):
+    '''
+        "func" of the values [k0, k1) by two overlapping ranges of a level.
+    '''
+    level = (k1 - k0).bit_length() - 1
+    return func(levels[level][k0], levels[level][k1 - 2 ** level])
+
+class RegionStats:
+    '''
+        Tables of blocks of the values, built by chunks so that large
+        memory-mapped values are never read wholly.
+    '''
+    def __init__(self, vals, block=BlockSize, progress=None, cancelled=None):
+        self.Vals = vals
+        self.Block = block = max(block, -(-len(vals) // MaxBlocks))
+        self.AccType = acc_type(vals.dtype)
+        self.Cancelled = False
+
+        nblocks = len(vals) // block
+        sums = np.zeros(nblocks + 1, dtype=self.AccType)
+        means = np.empty(nblocks)
+        m2s = np.zeros(nblocks + 1)
+        hists = np.zeros((nblocks + 1, 256), dtype=np.int64)
+        mins = np.empty(nblocks, dtype=vals.dtype)
+        maxs = np.empty(nblocks, dtype=vals.dtype)
+
+        step = max(ChunkSize // block, 1)
+        for k0 in range(0, nblocks, step):
+            k1 = min(k0 + step, nblocks)
+            blocks = np.asarray(vals[k0 * block:k1 * block]).reshape(k1 - k0, block)
+            sums[k0 + 1:k1 + 1] = blocks.sum(axis=1, dtype=self.AccType)
+            means[k0:k1] = blocks.mean(axis=1, dtype=np.float64)
+            m2s[k0 + 1:k1 + 1] = np.square(blocks - means[k0:k1, None]).sum(axis=1)
+            hists[k0 + 1:k1 + 1] = window_histograms(blocks.reshape(-1), block, block)
+            mins[k0:k1] = blocks.min(axis=1)
+            maxs[k0:k1] = blocks.max(axis=1)
+
+            if progress is not None:
+                progress(100 * k1 // nblocks)
+            if cancelled is not None and cancelled():
+                self.Cancelled = True
+                return
+
+        self.Sums = np.cumsum(sums, dtype=self.AccType)
+        # block means are shifted by the mean of all so that their sums stay small
+        self.Ref = means.mean() if nblocks else 0.
+        shifted = means - self.Ref
+        self.MeanSums = np.concatenate(([0.], np.cumsum(shifted)))
+        self.MeanSqSums = np.concatenate(([0.], np.cumsum(np.square(shifted))))
+        self.M2s = np.cumsum(m2s)
+        self.Hists = np.cumsum(hists, axis=0, out=hists)
+        self.Mins = sparse_table(mins, np.minimum)
+        self.Maxs = sparse_table(maxs, np.maximum)
+
+    def __len__(self):
+        return len(self.Vals)
+
+    def query(self, start, stop):
+        '''
+            Statistics of the values [start, stop), None for an empty range:
+            - count, min, max, mean, std
+            - delta: change of the integrate values over the range, which is
+              the sum of the values
+            - entropy and histogram (256 counts) of the bytes
+        '''
+        start, stop = max(int(start), 0), min(int(stop), len(self.Vals))
+        if stop <= start:
+            return None
+
+        block = self.Block
+        k0, k1 = -(-start // block), stop // block
+        if k0 >= k1:
+            parts = [self.Vals[start:stop]]
+            total = self.AccType(0)
+            stats = (0, 0., 0.)
+            hist = np.zeros(256, dtype=np.int64)
+            lo = hi = None
+        else:
+            parts = [self.Vals[start:k0 * block], self.Vals[k1 * block:stop]]
+            total = self.Sums[k1] - self.Sums[k0]
+            # moments of the whole blocks from the shifted block means
+            nblocks = k1 - k0
+            meanShift = (self.MeanSums[k1] - self.MeanSums[k0]) / nblocks
+            between = self.MeanSqSums[k1] - self.MeanSqSums[k0] - nblocks * meanShift * meanShift
+            stats = (nblocks * block, self.Ref + meanShift,
+                     self.M2s[k1] - self.M2s[k0] + block * max(between, 0))
+            hist = self.Hists[k1] - self.Hists[k0]
+            lo = table_query(self.Mins, np.minimum, k0, k1)
+            hi = table_query(self.Maxs, np.maximum, k0, k1)
+
+        # the partial blocks at the ends are scanned
+        for part in parts:
+            if len(part) == 0:
+                continue
+            total += part.sum(dtype=self.AccType)
+            stats = combine(stats, moments(part)) if stats[0] else moments(part)
+            hist = hist + np.bincount(as_bytes(part), minlength=256)
+            lo = part.min() if lo is None else min(lo, part.min())
+            hi = part.max() if hi is None else max(hi, part.max())
+
+        count, mean, m2 = stats
+        # clip the tiny negative values caused by rounding
+        std = float(np.sqrt(max(m2, 0) / count))
+        # from the 256 counts, the bytes of a selection are too many for a table
+        nbytes = hist.sum()
+        counts = hist[hist > 0]
+        entropy = float(np.log2(nbytes) - (counts * np.log2(counts)).sum() / nbytes)
+        return {'count': count, 'min': lo, 'max': hi, 'mean': mean, 'std': std,
+                'delta': total, 'entropy': entropy, 'histogram': hist}
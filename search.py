@@ -0,0 +1,141 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    Search over the values read, to find where something occurs:
+    - exact byte sequences in the bytes of the values
+    - values in a range [lo, hi]
+    - crossings of a threshold, upward or downward
+
+    All searches are vectorized and scan the values by chunks, so that
+    a memory-mapped file is never loaded entirely. For repeated byte
+    sequence searches on the same values, a ByteIndex can be built once:
+    it sorts the positions of all 2-byte grams (by a counting sort done
+    chunk by chunk, so the index of 4 bytes per byte is the only large
+    allocation), and a query only verifies the positions of its rarest
+    2-byte gram.
+
+    Results are sample indices (not byte positions) in ascending order,
+    at most "limit" of them are returned.
+'''
+
+import numpy as np
+
+from slidingStats import as_bytes
+
+ChunkSize = 1 << 24         # values scanned per chunk
+IndexChunk = 1 << 20        # positions sorted per chunk when building a ByteIndex
+
+def parse_bytes(text):
+    '''
+        Parse a hex string such as "de ad be ef" or "deadbeef" to bytes.
+    '''
+    try:
+        pattern = bytes.fromhex(text.replace(' ', ''))
+    except ValueError:
+        raise ValueError('无法解析的十六进制字节串')
+    if not pattern:
+        raise ValueError('字节串为空')
+    return np.frombuffer(pattern, dtype=np.uint8)
+
+def match_at(data, starts, pattern):
+    '''
+        Keep the start positions where the whole pattern matches.
+    '''
+    starts = starts[starts + len(pattern) <= len(data)]
+    for i in range(len(pattern)):
+        starts = starts[data[starts + i] == pattern[i]]
+    return starts
+
+def find_bytes(vals, pattern, limit):
+    data = as_bytes(vals)
+    itemsize = vals.dtype.itemsize
+    hits = []
+    cnt = 0
+    for c0 in range(0, len(data), ChunkSize):
+        # chunks overlap by the pattern length so no match is split
+        chunk = data[c0:c0 + ChunkSize + len(pattern) - 1]
+        starts = np.flatnonzero(chunk[:ChunkSize] == pattern[0])
+        starts = match_at(chunk, starts, pattern) + c0
+        hits.append(starts)
+        cnt += len(starts)
+        if cnt >= limit:
+            break
+    return np.unique(np.concatenate(hits) // itemsize)[:limit] if hits else np.empty(0, dtype=np.int64)
+
+def find_range(vals, lo, hi, limit):
+    hits = []
+    cnt = 0
+    for c0 in range(0, len(vals), ChunkSize):
+        chunk = vals[c0:c0 + ChunkSize]
+        idx = np.flatnonzero((chunk >= lo) & (chunk <= hi)) + c0
+        hits.append(idx)
+        cnt += len(idx)
+        if cnt >= limit:
+            break
+    return np.concatenate(hits)[:limit] if hits else np.empty(0, dtype=np.int64)
+
+def find_crossings(vals, threshold, upward, limit):
+    '''
+        Index i is a crossing when vals[i-1] < threshold <= vals[i] (upward)
+        or vals[i-1] >= threshold > vals[i] (downward).
+    '''
+    hits = []
+    cnt = 0
+    for c0 in range(1, len(vals), ChunkSize):
+        above = vals[c0 - 1:c0 + ChunkSize] >= threshold
+        crossed = above[1:] & ~above[:-1] if upward else above[:-1] & ~above[1:]
+        idx = np.flatnonzero(crossed) + c0
+        hits.append(idx)
+        cnt += len(idx)
+        if cnt >= limit:
+            break
+    return np.concatenate(hits)[:limit] if hits else np.empty(0, dtype=np.int64)
+
+class ByteIndex:
+    '''
+        Index of the positions of all 2-byte grams in the bytes of values.
+    '''
+    def __init__(self, vals):
+        self.Itemsize = vals.dtype.itemsize
+        self.Data = as_bytes(vals)
+        n = len(self.Data)
+        posType = np.uint32 if n < 2**32 else np.int64
+
+        # first pass counts the 2-byte grams starting at each position
+        counts = np.zeros(65536, dtype=np.int64)
+        for c0 in range(0, n - 1, IndexChunk):
+            counts += np.bincount(self.gram_codes(self.Data[c0:c0 + IndexChunk + 1]), minlength=65536)
+        self.Bounds = np.zeros(65537, dtype=np.int64)
+        np.cumsum(counts, out=self.Bounds[1:])
+
+        # second pass places the positions of each chunk after the former ones
+        # of the same gram, so the positions of a gram stay ascending
+        self.Positions = np.empty(max(n - 1, 0), dtype=posType)
+        cursor = self.Bounds[:-1].copy()
+        for c0 in range(0, n - 1, IndexChunk):
+            grams = self.gram_codes(self.Data[c0:c0 + IndexChunk + 1])
+            order = np.argsort(grams, kind='stable')
+            sortedGrams = grams[order]
+            chunkCounts = np.bincount(grams, minlength=65536)
+            # rank of each position among the positions of its gram in the chunk
+            ranks = np.arange(len(grams)) - (np.cumsum(chunkCounts) - chunkCounts)[sortedGrams]
+            self.Positions[cursor[sortedGrams] + ranks] = order + c0
+            cursor += chunkCounts
+
+    @staticmethod
+    def gram_codes(data):
+        return (data[:-1].astype(np.uint16) << 8) | data[1:]
+
+    def find(self, pattern, limit):
+        if len(pattern) < 2:
+            return np.unique(find_bytes(self.Data, pattern, len(self.Data)) // self.Itemsize)[:limit]
+
+        # the rarest gram of the pattern gives the fewest candidates
+        grams = self.gram_codes(pattern)
+        counts = self.Bounds[grams.astype(np.int64) + 1] - self.Bounds[grams]
+        k = int(np.argmin(counts))
+        gram = int(grams[k])
+        positions = self.Positions[self.Bounds[gram]:self.Bounds[gram + 1]].astype(np.int64) - k
+
+        starts = match_at(self.Data, positions[positions >= 0], pattern)
+        return np.unique(starts // self.Itemsize)[:limit]
@@ -0,0 +1,233 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    Sliding-window statistics of the values read, used by "Engine"
+    as derived series besides the differential and integrate values.
+
+    Windows are given by a size and a step (both by sample), window i
+    covers samples [i*step, i*step+window). Statistics are:
+    - Mean and Variance of the values, computed from the cumulative
+      sums of values and of squared values, so each window costs O(1).
+      The sums are taken by chunks of windows after subtracting the
+      mean of the chunk, so that they stay small and the variance does
+      not lose its precision to the magnitude of the values.
+    - Byte histograms and Shannon entropy (bits per byte) of the bytes
+      of each window, counted by np.bincount over a strided window view.
+      When a window is made of whole steps, each step is counted once
+      and the windows are summed from the cumulative histograms. The
+      entropy is a plotted series, while the histograms (256 counts per
+      window) are reduced to an image of rows of windows by
+      "HistogramImage" instead of being kept per window.
+
+    Every statistic is processed by chunks of windows, so the memory is
+    bounded by the chunk size and the results can be written into given
+    arrays (such as memory-mapped scratch files).
+
+    Values input should be a Numpy array and results are Numpy arrays
+    with one value per window.
+'''
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+ChunkSize = 1 << 20         # samples (or bytes) processed per chunk of windows
+HistWindows = 1 << 14       # max count of window histograms counted at a time
+MaxTable = 1 << 16          # max count of the table of entropy terms
+
+def window_count(n, window, step):
+    if window <= 0 or step <= 0:
+        raise ValueError('窗口大小和步长必须为正数')
+    return (n - window) // step + 1 if n >= window else 0
+
+def acc_type(dtype):
+    '''
+        Accumulating dtype of sums, exact int64 for small integers whose squares
+        can not overflow, float64 otherwise.
+    '''
+    dtype = np.dtype(dtype)
+    return np.int64 if dtype.kind in 'iub' and dtype.itemsize <= 2 else np.float64
+
+def window_chunks(n, window, step, chunk=ChunkSize):
+    '''
+        Yield (i0, i1), the ranges of windows covering about "chunk" samples.
+    '''
+    nwin = window_count(n, window, step)
+    perChunk = max((chunk - window) // step + 1, 1)
+    for i0 in range(0, nwin, perChunk):
+        yield i0, min(i0 + perChunk, nwin)
+
+def window_moments(vals, window, step, i0, i1):
+    '''
+        Mean and variance of the windows [i0, i1). The samples are shifted by
+        their mean before being summed: small integers are shifted by the
+        rounded mean and summed exactly, the others are summed in float64.
+    '''
+    dtype = acc_type(vals.dtype)
+    seg = np.asarray(vals[i0 * step:(i1 - 1) * step + window])
+    ref = seg.mean(dtype=np.float64)
+    ref = dtype(np.round(ref)) if dtype is np.int64 else ref
+    shifted = seg.astype(dtype) - ref
+
+    starts = np.arange(i1 - i0) * step
+    cumsum = np.zeros(len(seg) + 1, dtype=dtype)
+    np.cumsum(shifted, out=cumsum[1:])
+    sums = cumsum[starts + window] - cumsum[starts]
+    np.cumsum(np.square(shifted, out=shifted), out=cumsum[1:])
+    sqSums = cumsum[starts + window] - cumsum[starts]
+
+    mean = sums / window
+    # clip the tiny negative values caused by rounding
+    return mean + ref, np.maximum(sqSums / window - mean * mean, 0)
+
+def sliding_moments(vals, window, step, means=None, variances=None):
+    nwin = window_count(len(vals), window, step)
+    means = np.empty(nwin) if means is None else means
+    variances = np.empty(nwin) if variances is None else variances
+    for i0, i1 in window_chunks(len(vals), window, step):
+        means[i0:i1], variances[i0:i1] = window_moments(vals, window, step, i0, i1)
+    return means, variances
+
+def sliding_mean(vals, window, step):
+    return sliding_moments(vals, window, step)[0]
+
+def sliding_variance(vals, window, step):
+    return sliding_moments(vals, window, step)[1]
+
+def as_bytes(vals):
+    '''
+        Bytes of the values, a view when the values are contiguous.
+    '''
+    return np.ascontiguousarray(vals).reshape(-1).view(np.uint8)
+
+def iter_window_histograms(vals, window, step, i0=0, i1=None):
+    '''
+        Yield (first window index, byte histograms) by chunks of the windows
+        [i0, i1), the histograms are of shape (windows in chunk, 256).
+    '''
+    nwin = window_count(len(vals), window, step)
+    i1 = nwin if i1 is None else i1
+    if i1 <= i0:
+        return
+
+    itemsize = vals.dtype.itemsize
+    windowBytes, stepBytes = window * itemsize, step * itemsize
+    # windows are bounded by both the bytes and the histograms of a chunk
+    chunk = max(min(ChunkSize // windowBytes, HistWindows), 1)
+    for c0 in range(i0, i1, chunk):
+        c1 = min(c0 + chunk, i1)
+        data = as_bytes(vals[c0 * step:(c1 - 1) * step + window])
+        if window % step == 0:
+            # windows made of whole steps: each step is counted once and the
+            # histograms of windows are differences of the cumulative ones
+            span = window // step
+            steps = c1 - c0 + span - 1
+            hist = np.zeros((steps + 1, 256), dtype=np.int64)
+            hist[1:] = count_rows(data.reshape(steps, stepBytes))
+            np.cumsum(hist, axis=0, out=hist)
+            yield c0, hist[span:] - hist[:-span]
+        else:
+            yield c0, count_rows(sliding_window_view(data, windowBytes)[::stepBytes])
+
+def count_rows(rows):
+    '''
+        Byte histogram of each row of a 2D uint8 array, of shape (rows, 256).
+    '''
+    # offset the bytes of each row to its own 256 bins
+    bins = rows + (np.arange(len(rows), dtype=np.int32) * 256)[:, None]
+    return np.bincount(bins.ravel(), minlength=len(rows) * 256).reshape(len(rows), 256)
+
+def window_histograms(vals, window, step):
+    nwin = window_count(len(vals), window, step)
+    hists = np.empty((nwin, 256), dtype=np.int64)
+    for i0, hist in iter_window_histograms(vals, window, step):
+        hists[i0:i0 + len(hist)] = hist
+    return hists
+
+def histogram_entropy(hist, total):
+    '''
+        Entropy of the rows of histograms by bits, "total" is the count of
+        each row: H = log2(total) - sum(c * log2(c)) / total. The terms are
+        looked up from a table of all counts up to "total" when it is small
+        (such as the bytes of a window), computed from the counts otherwise.
+    '''
+    if total > MaxTable:
+        terms = hist * np.log2(hist, where=hist > 0, out=np.zeros(hist.shape))
+        return np.log2(total) - terms.sum(axis=1) / total
+    counts = np.arange(total + 1, dtype=np.float64)
+    table = counts * np.log2(counts, where=counts > 0, out=np.zeros(total + 1))
+    return np.log2(total) - table[hist].sum(axis=1) / total
+
+def sliding_entropy(vals, window, step, entropy=None, i0=0, i1=None):
+    nwin = window_count(len(vals), window, step)
+    entropy = np.empty(nwin, dtype=np.float64) if entropy is None else entropy
+    windowBytes = window * vals.dtype.itemsize
+    for c0, hist in iter_window_histograms(vals, window, step, i0, i1):
+        entropy[c0:c0 + len(hist)] = histogram_entropy(hist, windowBytes)
+    return entropy
+
+class HistogramImage:
+    '''
+        Byte histograms of windows reduced to at most "rows" rows, a row is the
+        mean histogram of successive windows by fraction of bytes.
+    '''
+    def __init__(self, nwin, windowBytes, step, rows):
+        self.Count = nwin
+        self.WindowBytes = windowBytes
+        self.PerRow = max(-(-nwin // rows), 1)
+        self.RowSpan = self.PerRow * step
+        self.Sums = np.zeros((-(-nwin // self.PerRow), 256))
+        self.Done = 0
+
+    def add(self, i0, hist):
+        '''
+            Accumulate the histograms of the windows from i0 on.
+        '''
+        rows = np.arange(i0, i0 + len(hist)) // self.PerRow
+        firsts = np.flatnonzero(np.concatenate(([True], rows[1:] != rows[:-1])))
+        self.Sums[rows[firsts]] += np.add.reduceat(hist, firsts, axis=0)
+        self.Done = i0 + len(hist)
+
+    def result(self):
+        '''
+            Copy of the rows done, of shape (rows, 256), and the fraction done.
+        '''
+        rows = -(-self.Done // self.PerRow)
+        counts = np.minimum(self.Done - np.arange(rows) * self.PerRow, self.PerRow)
+        image = self.Sums[:rows] / (counts[:, None] * self.WindowBytes)
+        return {'image': image, 'rowSpan': self.RowSpan,
+                'done': self.Done / self.Count if self.Count else 1.}
+
+def iter_histogram_image(vals, window, step, rows):
+    '''
+        Compute the HistogramImage by chunks of windows, it is yielded after
+        each chunk (and once for values shorter than a window).
+    '''
+    nwin = window_count(len(vals), window, step)
+    image = HistogramImage(nwin, window * vals.dtype.itemsize, step, rows)
+    if nwin == 0:
+        yield image
+    for i0, hist in iter_window_histograms(vals, window, step):
+        image.add(i0, hist)
+        yield image
+
+def sliding_stats(vals, window, step, out=None, progress=None, cancelled=None):
+    '''
+        All the statistics plotted as series, keyed by plot name.
+        :param out: arrays keyed by plot name to write the statistics into (such
+                as memory-mapped files), None to allocate them
+        :param progress, cancelled: callbacks of Worker, progress is by percent
+        :return: the statistics, or None if cancelled
+    '''
+    nwin = window_count(len(vals), window, step)
+    if out is None:
+        out = {name: np.empty(nwin) for name in ('Entropy', 'Mean', 'Variance')}
+
+    for i0, i1 in window_chunks(len(vals), window, step):
+        out['Mean'][i0:i1], out['Variance'][i0:i1] = window_moments(vals, window, step, i0, i1)
+        sliding_entropy(vals, window, step, out['Entropy'], i0, i1)
+
+        if progress is not None:
+            progress(100 * i1 // nwin)
+        if cancelled is not None and cancelled():
+            return None
+    return out
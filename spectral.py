@@ -0,0 +1,121 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    Spectral analysis of the values read, to spot the periodic
+    structures of files.
+
+    Values are cut into frames of "window" samples every "hop"
+    samples, by a strided view without copying. The mean of each frame
+    is removed and a window function is applied, then the frames are
+    transformed together by one batched np.fft.rfft, chunk by chunk so
+    that the memory is bounded by the chunk size.
+
+    Two results are accumulated from the power of frames:
+    - spectrum: the mean power of all frames (Welch's method)
+    - spectrogram: the power of frames, averaged by groups of frames
+      so that the image has at most a given count of rows
+
+    Frequencies are in cycles per sample (0 to 0.5) and powers are in
+    dB. The chunks are yielded one by one, so that large memory-mapped
+    files can be shown progressively.
+'''
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from slidingStats import window_count
+
+ChunkSize = 1 << 22         # samples transformed at a time
+Tiny = 1e-12                # floor of power before taking the log
+Windows = {'hann': np.hanning, 'hamming': np.hamming, 'blackman': np.blackman, 'rect': np.ones}
+
+def window_func(name, size):
+    func = Windows.get(name)
+    if func is None:
+        raise ValueError('不支持的窗函数')
+    return func(size)
+
+def frame_view(vals, window, hop):
+    '''
+        Frames of the values as a strided view of shape (frames, window).
+    '''
+    nframes = window_count(len(vals), window, hop)
+    return sliding_window_view(vals[:(nframes - 1) * hop + window], window)[::hop]
+
+def frame_power(frames, taper):
+    '''
+        Power spectra of the frames, of shape (frames, window // 2 + 1).
+    '''
+    x = frames.astype(np.float64)
+    x -= x.mean(axis=1, keepdims=True)
+    x *= taper
+    spec = np.fft.rfft(x, axis=1)
+    return spec.real ** 2 + spec.imag ** 2
+
+def to_db(power):
+    return 10 * np.log10(np.maximum(power, Tiny))
+
+class Spectrogram:
+    '''
+        Spectrum and spectrogram accumulated by chunks of frames.
+    '''
+    def __init__(self, nframes, window, hop, rows):
+        self.Window = window
+        self.Hop = hop
+        self.Count = nframes            # count of all frames
+        self.Frames = 0                 # count of frames accumulated
+        self.FramesPerRow = max(-(-nframes // max(rows, 1)), 1)
+        self.Power = np.zeros((-(-nframes // self.FramesPerRow), window // 2 + 1))
+        self.Total = np.zeros(window // 2 + 1)
+
+    def add(self, power):
+        '''
+            Accumulate the power of the next frames, the count of them must be
+            a multiple of FramesPerRow except for the last frames.
+        '''
+        if len(power) == 0:
+            return
+        r0 = self.Frames // self.FramesPerRow
+        idx = np.arange(0, len(power), self.FramesPerRow)
+        counts = np.diff(np.append(idx, len(power)))
+        self.Power[r0:r0 + len(idx)] = np.add.reduceat(power, idx, axis=0) / counts[:, None]
+        self.Total += power.sum(axis=0)
+        self.Frames += len(power)
+
+    def result(self):
+        '''
+            Copy of the accumulated results:
+            - freqs: frequencies of bins by cycles per sample
+            - spectrum: mean power of frames by dB
+            - image: the rows done of spectrogram by dB, of shape (rows, bins)
+            - rowSpan: count of samples between two rows
+            - done: fraction of frames accumulated
+        '''
+        rows = -(-self.Frames // self.FramesPerRow)
+        return {'freqs': np.fft.rfftfreq(self.Window),
+                'spectrum': to_db(self.Total / max(self.Frames, 1)),
+                'image': to_db(self.Power[:rows]),
+                'rowSpan': self.FramesPerRow * self.Hop,
+                'done': self.Frames / self.Count if self.Count else 1.}
+
+def iter_spectrogram(vals, window, hop, rows, windowName='hann', chunk=ChunkSize):
+    '''
+        Compute the spectrogram by chunks of frames, the Spectrogram is yielded
+        after each chunk.
+        :param window, hop: frame size and the step between frames by sample
+        :param rows: max count of rows of the spectrogram
+        :param windowName: 'hann', 'hamming', 'blackman' or 'rect'
+    '''
+    taper = window_func(windowName, window)
+    nframes = window_count(len(vals), window, hop)
+    spec = Spectrogram(nframes, window, hop, rows)
+    if nframes == 0:
+        yield spec
+        return
+
+    frames = frame_view(vals, window, hop)
+    # chunks cover whole rows
+    step = max(chunk // window // spec.FramesPerRow, 1) * spec.FramesPerRow
+    for f0 in range(0, nframes, step):
+        spec.add(frame_power(frames[f0:f0 + step], taper))
+        yield spec
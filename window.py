@@ -13,6 +13,10 @@
     processing logic knows nothing about the window and
     the control is in main window, the caller who decides
     the argments of api calling.
+
+    Loading, resizing, view updating and painting of plots are timed
+    by the profiling module, and the timings are shown by a toggleable
+    overlay in the status bar.
 '''
 
 from PyQt5 import QtWidgets as widgets
@@ -21,32 +25,77 @@ from PyQt5 import QtGui as gui
 import pyqtgraph as pg
 import numpy as np
 
+import profiling
 from windowEventHandling import resize_plots_adaptively, get_show_color_dialog_handler, \
                                     visible_panel_onchange, get_bgcolor_reset_handler, \
                                     get_cuvColor_reset_handler, get_marker_visible_handler,\
                                     get_grid_visible_handler, get_markerColor_reset_handler, \
-                                    get_open_file_handler
-from components import ColorFrame
+                                    get_open_file_handler, get_word_format_handler, \
+                                    get_open_files_handler, get_save_file_handler
+from components import ColorFrame, SearchPanel, SpectrumPanel, HistogramPanel, OverviewPanel, RegionPanel
+from worker import Worker
+from decimation import MinMaxPyramid
+from comparison import union_runs, merge_runs
+
+AxisWidth = 70          # width of y axis of linked plots by pixel
+RegionLimit = 200       # max count of mismatch regions drawn
+ExportFilters = 'NumPy (*.npy);;Compressed NumPy (*.npz);;Raw binary (*.bin);;CSV (*.csv)'
+OverlayInterval = 500   # refreshing interval of performance overlay by ms
+OverlaySpans = ['load', 'loading', 'differential', 'integrate', 'chunked', 'stats', 'pyramid',
+                'load_datas', 'view', 'resize', 'paint', 'region']
 
 class MainWindow(widgets.QMainWindow):
     '''
         This class provide the window to display the values and processing
         logics are integrated inside to provide interactions.
     '''
-    def __init__(self, title, names, cfg, datas, reloadProcessor):
+    def __init__(self, title, names, cfg, datas, reloadProcessor, followProcessor=None, compareProcessor=None):
         super(MainWindow, self).__init__()
         self.Cfg = cfg
+
+        # rendering options must be set before plot widgets are created
+        useOpenGL = self.Cfg.RenderBackend in ('opengl', 'software')
+        pg.setConfigOptions(antialias=self.Cfg.Antialias, useOpenGL=useOpenGL,
+                            enableExperimental=useOpenGL)
         self.setWindowTitle(title)
-        self.setWindowIcon(gui.QIcon(self.Cfg['IconPath']))
+        self.setWindowIcon(gui.QIcon(self.Cfg.IconPath))
 
         self.PlotNames = names
         self.PlotWidgets = {}.fromkeys(self.PlotNames)
         self.PlotCheckBoxes = {}.fromkeys(self.PlotNames)
+        self.MarkerCheckBoxes = {}.fromkeys(self.PlotNames)
         self.PlotLabels = {}.fromkeys(self.PlotNames)
         self.PlotItems = {}.fromkeys(self.PlotNames)
+        self.Pyramids = {}.fromkeys(self.PlotNames)       # level-of-detail pyramid of each plot
+        self.StalePlots = {}            # hidden plots to redraw when shown, name -> whether full range
+        self.Crosshairs = {}.fromkeys(self.PlotNames)
+        self.Regions = {}.fromkeys(self.PlotNames)        # selected range of region statistics
+        self.MarkerFlags = {name:getattr(self.Cfg, name + 'Marker') for name in self.PlotNames}
         self.VisiblePlotCnt = 0
         self.Datas = datas
+        self.DataFormat = None          # WordFormat of the loaded values
         self.ReloadProcessor = reloadProcessor          # the handler processing file loading event
+        self.FollowProcessor = followProcessor          # the handler switching follow mode of file
+        self.CompareProcessor = compareProcessor        # the handler loading files to compare
+        self.Comparisons = []           # compared files overlaid on the first plot
+        self.MismatchRuns = None        # union of mismatch runs of compared files
+        self.MismatchRegions = []       # pool of region items highlighting the runs
+        self.ExportWorker = None
+        self.SpectrumDock = None
+        self.SpectrumWorker = None
+        self.SpectrumVals = None        # values whose spectrum is shown or computing
+        self.HistogramDock = None
+        self.HistogramWorker = None
+        self.HistogramVals = None       # values whose histograms are shown or computing
+        self.OverviewDock = None
+        self.OverviewWorker = None
+        self.OverviewVals = None        # values whose overview is shown or computing
+        self.RegionDock = None
+        self.RegionWorker = None
+        self.RegionVals = None          # values whose tables are built or building
+        self.RegionStats = None         # tables of region statistics of the values
+        self.RegionSyncing = False      # set while the regions follow the dragged one
+        self.RegionPlaced = False       # whether the regions are placed in view
 
         self.UIinit()
 
@@ -56,15 +105,22 @@ class MainWindow(widgets.QMainWindow):
         '''
 
         # resize the window and fix
-        self.resize(self.Cfg['WindowWidth'], self.Cfg['WindowHeight'])
-        self.setFixedSize(self.Cfg['WindowWidth'], self.Cfg['WindowHeight'])
+        self.resize(self.Cfg.WindowWidth, self.Cfg.WindowHeight)
+        self.setFixedSize(self.Cfg.WindowWidth, self.Cfg.WindowHeight)
 
         # global layout
         self.global_layout()
 
+        # add progress bar of loading to status bar
+        self.add_progress_bar()
+
         # add plot widget to plot layout
         for name in self.PlotNames:
-            self.add_plot_widget(name, self.Cfg['PlotWidth'], self.Cfg['PlotHeight'])
+            self.add_plot_widget(name, self.Cfg.PlotWidth, self.Cfg.PlotHeight)
+
+        # one view range drives all plots
+        if self.Cfg.LinkXAxes:
+            self.link_plots()
 
         # loading data before control panel constructed, after widgets ready
         self.load_datas(self.Datas)
@@ -72,13 +128,37 @@ class MainWindow(widgets.QMainWindow):
         # add visible widget to panel layout
         self.add_visible_widget()
 
-        # add adjusting panel to panel layout
+        # add adjusting panel to panel layout, one tab for each plot
+        self.AdjustTabs = widgets.QTabWidget(self)
         for name in self.PlotNames:
             self.add_adjust_panel(name)
+        self.panelLayout.addStretch(50)
+        self.panelLayout.addWidget(self.AdjustTabs)
 
         # add opening file menu
         self.add_file_menu()
 
+        # add exporting menu next to file menu
+        self.add_export_menu()
+
+        # add search panel and its menu
+        self.add_search_panel()
+
+        # add performance overlay and its menu
+        self.add_profile_overlay()
+
+        # add spectrum panel, overview panel and region panel to the view menu
+        self.add_spectrum_panel()
+        self.add_histogram_panel()
+        self.add_overview_panel()
+        self.add_region_panel()
+
+        # fit the visible plots to the plot area
+        self.resize_plots()
+
+        # changed configs are applied at once
+        self.Cfg.subscribe(self.config_changed)
+
         self.show()
 
 
@@ -113,7 +193,7 @@ class MainWindow(widgets.QMainWindow):
 
         # create widget label
         visLabel = widgets.QLabel('Visible setting', self)
-        visLabel.setStyleSheet(self.Cfg['LabelOneFontStyle'])
+        visLabel.setStyleSheet(self.Cfg.LabelOneFontStyle)
         visLabel.setAlignment(core.Qt.AlignBottom | core.Qt.AlignLeft)
         visLayout.addWidget(visLabel)
         visLayout.setAlignment(core.Qt.AlignTop)
@@ -121,10 +201,10 @@ class MainWindow(widgets.QMainWindow):
         # create check boxes
 
         for name in self.PlotNames:
-            self.add_checkbox_widget(label=name,
-                                     checked=self.Cfg[name + 'Visible'],
-                                     handler=self.visible_panel_onchange_adapter,
-                                     parent=visLayout)
+            self.PlotCheckBoxes[name] = self.add_checkbox_widget(label=name,
+                                                                 checked=self.Cfg.isVisible(name),
+                                                                 handler=self.visible_panel_onchange_adapter,
+                                                                 parent=visLayout)
 
         # add the visible panel to the pabel layout
         self.panelLayout.addLayout(visLayout)
@@ -133,32 +213,56 @@ class MainWindow(widgets.QMainWindow):
 
     def add_plot_widget(self, label, w, h):
         '''
-            Add a plot widget to plotLayout without filling a plotItem in it.
-            Showgrid attribute and style are set according to configs. The "label"
-            parameter is the name of the plot widget and w,h refer to plot width and
-            height respectively that are decided by configs.
+            Add a plot widget to plotLayout with an empty plotItem in it, the datas
+            are filled by "load_datas". Showgrid attribute and style are set according
+            to configs. The "label" parameter is the name of the plot widget and w,h
+            refer to plot width and height respectively that are decided by configs.
         '''
 
         plotWidget = pg.PlotWidget()
         plotLabel = widgets.QLabel(label, self)
 
         # set grid
-        showGrid = self.Cfg['ShowGrid']
+        showGrid = self.Cfg.ShowGrid
         plotWidget.showGrid(x=showGrid, y=showGrid)
 
         # plot label is set big one font style
-        plotLabel.setStyleSheet(self.Cfg['LabelOneFontStyle'])
+        plotLabel.setStyleSheet(self.Cfg.LabelOneFontStyle)
 
         # adjust the size of plot
         plotWidget.resize(w, h)
         plotWidget.setFixedSize(w, h)
 
         # visible setting
-        isVisible = self.Cfg[label+'Visible']
+        isVisible = self.Cfg.isVisible(label)
+        plotWidget.setVisible(isVisible)
+        plotLabel.setVisible(isVisible)
         if isVisible:
-            plotWidget.setVisible(True)
             self.VisiblePlotCnt += 1
 
+        # empty plot item, points are re-queried when the x range changes
+        plotItem = pg.PlotDataItem()
+        plotItem.setSymbolBrush(pg.mkBrush(color=self.Cfg.MarkerColor))
+        plotItem.setClipToView(self.Cfg.ClipToView)
+        plotItem.setDownsampling(auto=self.Cfg.AutoDownsample, method=self.Cfg.DownsampleMethod)
+        plotWidget.addItem(plotItem)
+        self.time_paint(plotWidget)
+        plotWidget.sigXRangeChanged.connect(lambda *args, name=label: self.update_plot_view(name))
+        self.PlotItems[label] = plotItem
+
+        # crosshair following the mouse, not counted in the data bounds
+        crosshair = pg.InfiniteLine(angle=90, movable=False)
+        plotWidget.addItem(crosshair, ignoreBounds=True)
+        plotWidget.scene().sigMouseMoved.connect(lambda pos, name=label: self.crosshair_moved(name, pos))
+        self.Crosshairs[label] = crosshair
+
+        # selected range of statistics, shown with the region panel
+        region = pg.LinearRegionItem()
+        region.setVisible(False)
+        plotWidget.addItem(region, ignoreBounds=True)
+        region.sigRegionChanged.connect(lambda item, name=label: self.region_changed(name))
+        self.Regions[label] = region
+
         # add to layout
         self.plotLayout.addWidget(plotLabel)
         self.PlotLabels[label] = plotLabel
@@ -167,9 +271,23 @@ class MainWindow(widgets.QMainWindow):
 
 
 
+    def time_paint(self, plotWidget):
+        '''
+            Time every paint event of the plot widget as a frame, by replacing
+            the paintEvent of the instance.
+        '''
+        paintEvent = plotWidget.paintEvent
+
+        def timed_paint_event(ev):
+            with profiling.span('paint'):
+                paintEvent(ev)
+        plotWidget.paintEvent = timed_paint_event
+
+
+
     def add_adjust_panel(self, label):
         '''
-            Add an adjusting panel to the panelLayout, this module is in equal level
+            Add an adjusting panel to the tabs in panelLayout, this module is in equal level
             of visible panel. All child controling panels are in this layout including
             label tag, background color panel, curve color panel, marker color panel,
             marker visibility panel and grid visibility panel.
@@ -185,13 +303,13 @@ class MainWindow(widgets.QMainWindow):
         # panel trivials and labeling
         adjustPanel = widgets.QVBoxLayout()
         adjustPanelLabel = widgets.QLabel(label, self)
-        adjustPanelLabel.setStyleSheet(self.Cfg['LabelOneFontStyle'])
+        adjustPanelLabel.setStyleSheet(self.Cfg.LabelOneFontStyle)
         adjustPanelLabel.setAlignment(core.Qt.AlignLeft | core.Qt.AlignBottom)
         adjustPanel.addWidget(adjustPanelLabel)
 
         # for bg color panel
         bgColorPanel = widgets.QVBoxLayout()
-        bgColorRGB = self.Cfg['PlotBgColor']
+        bgColorRGB = self.Cfg.PlotBgColor
         bgColorOnChangeHandler = get_bgcolor_reset_handler(self.PlotWidgets[label])
         labelContent = 'background color'
         self.add_color_adjust_widget(labelContent, bgColorRGB, bgColorOnChangeHandler, bgColorPanel)
@@ -199,7 +317,7 @@ class MainWindow(widgets.QMainWindow):
 
         # for cuv color panel
         cuvColorPanel = widgets.QVBoxLayout()
-        cuvColorRGB = self.Cfg['PlotCurveColor']
+        cuvColorRGB = self.Cfg.PlotCurveColor
         cuvColorOnChangeHandler = get_cuvColor_reset_handler(self.PlotItems[label])
         labelContent = 'curve color'
         self.add_color_adjust_widget(labelContent, cuvColorRGB, cuvColorOnChangeHandler, cuvColorPanel)
@@ -207,7 +325,7 @@ class MainWindow(widgets.QMainWindow):
 
         # for marker color panel
         mkColorPanel = widgets.QVBoxLayout()
-        mkColorRGB = self.Cfg['MarkerColor']
+        mkColorRGB = self.Cfg.MarkerColor
         print(mkColorRGB)
         mkColorOnChangeHandler = get_markerColor_reset_handler(self.PlotItems[label])
         mkContent = 'marker color'
@@ -224,8 +342,9 @@ class MainWindow(widgets.QMainWindow):
         adjustPanel.addLayout(cuvColorPanel)
         adjustPanel.addLayout(mkColorPanel)
 
-        self.panelLayout.addStretch(50)
-        self.panelLayout.addLayout(adjustPanel)
+        adjustWidget = widgets.QWidget(self)
+        adjustWidget.setLayout(adjustPanel)
+        self.AdjustTabs.addTab(adjustWidget, label)
 
 
 
@@ -244,7 +363,7 @@ class MainWindow(widgets.QMainWindow):
 
         # label
         bgColorLabel = widgets.QLabel(labelCont, self)
-        bgColorLabel.setStyleSheet(self.Cfg['LabelTwoFontStyle'])
+        bgColorLabel.setStyleSheet(self.Cfg.LabelTwoFontStyle)
         # let the label attach to the widget
         bgColorLabel.setAlignment(core.Qt.AlignBottom | core.Qt.AlignLeft)
 
@@ -281,9 +400,10 @@ class MainWindow(widgets.QMainWindow):
             of the editting plot should be provided.
         '''
 
-        handler = get_marker_visible_handler(self.PlotItems[name])
-        checked = self.Cfg['ShowGrid']
-        self.add_checkbox_widget(label='show marker', checked=checked, handler=handler, parent=parent)
+        handler = get_marker_visible_handler(self.Cfg, name)
+        checked = self.MarkerFlags[name]
+        self.MarkerCheckBoxes[name] = self.add_checkbox_widget(label='show marker', checked=checked,
+                                                               handler=handler, parent=parent)
 
 
 
@@ -293,7 +413,7 @@ class MainWindow(widgets.QMainWindow):
             except the handler. This method also uses the checkbox template to create widget quickly.
         '''
         handler = get_grid_visible_handler(self.PlotWidgets[name])
-        checked = self.Cfg[name + 'Marker']
+        checked = self.Cfg.ShowGrid
         self.add_checkbox_widget(label='show grid', checked=checked, handler=handler, parent=parent)
 
 
@@ -307,6 +427,7 @@ class MainWindow(widgets.QMainWindow):
         checkBox.setChecked(checked)
         checkBox.stateChanged.connect(handler)
         parent.addWidget(checkBox)
+        return checkBox
 
 
 
@@ -324,6 +445,626 @@ class MainWindow(widgets.QMainWindow):
         fileOpenAction.triggered.connect(get_open_file_handler(self, self.ReloadProcessor))
         fileMenu.addAction(fileOpenAction)
 
+        # word format of files, the current file is reloaded by the new format
+        wordFormatAction = widgets.QAction('&Word format...', self)
+        wordFormatAction.triggered.connect(get_word_format_handler(self, self.Cfg,
+                                                                   lambda: self.ReloadProcessor(None)))
+        fileMenu.addAction(wordFormatAction)
+
+        # follow mode, the growing file is read incrementally
+        if self.FollowProcessor is not None:
+            followAction = widgets.QAction('&Follow', self)
+            followAction.setCheckable(True)
+            followAction.toggled.connect(self.FollowProcessor)
+            fileMenu.addAction(followAction)
+
+        # comparison mode, other files are overlaid and compared to the loaded one
+        if self.CompareProcessor is not None:
+            compareAction = widgets.QAction('&Compare...', self)
+            compareAction.triggered.connect(get_open_files_handler(self, self.CompareProcessor))
+            fileMenu.addAction(compareAction)
+
+            clearAction = widgets.QAction('C&lear comparison', self)
+            clearAction.triggered.connect(lambda: self.set_comparisons([]))
+            fileMenu.addAction(clearAction)
+
+
+
+    def config_changed(self, name, value):
+        '''
+            Apply a changed config item to the window at once. The items of window
+            size, fonts and rendering need a restart, and the items of loading are
+            applied by "Engine".
+        '''
+        if name.endswith('Visible') and name[:-len('Visible')] in self.PlotCheckBoxes:
+            self.PlotCheckBoxes[name[:-len('Visible')]].setChecked(value)
+
+        elif name.endswith('Marker') and name[:-len('Marker')] in self.MarkerFlags:
+            plotName = name[:-len('Marker')]
+            self.MarkerFlags[plotName] = value
+            self.MarkerCheckBoxes[plotName].setChecked(value)
+            self.update_plot_view(plotName)
+
+        elif name == 'ShowGrid':
+            for plotWidget in self.PlotWidgets.values():
+                plotWidget.showGrid(x=value, y=value)
+
+        elif name == 'PlotBgColor':
+            for plotWidget in self.PlotWidgets.values():
+                get_bgcolor_reset_handler(plotWidget)(value)
+
+        elif name in ('PlotCurveColor', 'MarkerColor'):
+            getHandler = get_cuvColor_reset_handler if name == 'PlotCurveColor' else get_markerColor_reset_handler
+            for plotItem in self.PlotItems.values():
+                getHandler(plotItem)(value)
+
+        elif name in ('ClipToView', 'AutoDownsample', 'DownsampleMethod'):
+            for plotItem in self.PlotItems.values():
+                plotItem.setClipToView(self.Cfg.ClipToView)
+                plotItem.setDownsampling(auto=self.Cfg.AutoDownsample, method=self.Cfg.DownsampleMethod)
+
+        elif name in ('Marker', 'MarkerThreshold'):
+            for plotName in self.PlotNames:
+                self.update_plot_view(plotName)
+
+        elif name in ('PlotSlots', 'PlotWidth', 'PlotHeight'):
+            self.resize_plots()
+
+        elif name == 'LinkXAxes':
+            self.link_plots(value)
+
+        elif name == 'ProfileOverlay':
+            self.OverlayAction.setChecked(value)
+
+        elif name in ('SpectrumWindow', 'SpectrumHop', 'SpectrumWindowFunc', 'SpectrogramRows'):
+            if self.SpectrumDock.isVisible():
+                self.start_spectrum()
+
+        elif name == 'HistogramRows':
+            if self.HistogramDock.isVisible():
+                self.start_histogram()
+
+        elif name in ('OverviewWidth', 'OverviewPixels', 'OverviewHilbert'):
+            self.OverviewPanel.HilbertBox.setChecked(self.Cfg.OverviewHilbert)
+            if self.OverviewDock.isVisible():
+                self.start_overview()
+
+        elif name == 'RegionBlock':
+            if self.RegionDock.isVisible():
+                self.start_region_stats()
+
+
+
+    def add_export_menu(self):
+        '''
+            Add export menu next to the file menu, the series on the offset axis
+            (Value, Differential and Integrate) are exported as a whole or in the
+            view range. The format is chosen by the extension of file.
+        '''
+        exportMenu = self.menuBar().addMenu('&Export')
+        exportAllAction = widgets.QAction('Export &all...', self)
+        exportAllAction.triggered.connect(get_save_file_handler(self, lambda path: self.export(path, False),
+                                                                ExportFilters))
+        exportMenu.addAction(exportAllAction)
+
+        exportViewAction = widgets.QAction('Export &view range...', self)
+        exportViewAction.triggered.connect(get_save_file_handler(self, lambda path: self.export(path, True),
+                                                                 ExportFilters))
+        exportMenu.addAction(exportViewAction)
+
+
+
+    def export(self, path, viewRange):
+        '''
+            Export the series in a background worker, the exporting one is cancelled.
+            The series are streamed by chunks, so the memory-mapped values are never
+            read wholly.
+        '''
+        from export import export_series
+
+        if not path or not self.Datas:
+            return
+        datas = {name:self.Datas[name] for name in self.PlotNames
+                 if name in self.Datas and self.Pyramids[name] is not None and self.Pyramids[name].XStep == 1}
+
+        start, stop = 0, None
+        if viewRange:
+            x0, x1 = self.PlotWidgets[self.PlotNames[0]].getViewBox().viewRange()[0]
+            start, stop = max(int(np.floor(x0)), 0), max(int(np.ceil(x1)) + 1, 0)
+
+        if self.ExportWorker is not None:
+            self.ExportWorker.cancel()
+        self.ExportWorker = Worker(export_series, path, datas, start, stop)
+        self.ExportWorker.Signals.Progress.connect(lambda percent: self.show_progress(percent, 'Exporting...'))
+        self.ExportWorker.Signals.Finished.connect(self.export_finished)
+        self.ExportWorker.Signals.Failed.connect(self.export_failed)
+        self.show_progress(0, 'Exporting...')
+        self.ExportWorker.start()
+
+
+
+    def export_finished(self, path):
+        self.show_progress(None)
+        self.statusBar().showMessage('已导出到 %s' % path)
+
+    def export_failed(self, msg):
+        self.show_progress(None)
+        widgets.QMessageBox.information(self, 'Message', "%s，导出失败！"%msg)
+
+
+
+    def link_plots(self, linked=True):
+        '''
+            Link the x axes of all plots to the first one. All the series are
+            placed on the same offset axis, so a view range is shared by them.
+            The plots are unlinked when "linked" is False.
+        '''
+        first = self.PlotWidgets[self.PlotNames[0]]
+        for name in self.PlotNames:
+            # equal axis width keeps the offsets aligned between plots
+            self.PlotWidgets[name].getAxis('left').setWidth(AxisWidth if linked else None)
+            if name != self.PlotNames[0]:
+                self.PlotWidgets[name].setXLink(first if linked else None)
+
+
+
+    def crosshair_moved(self, name, pos):
+        '''
+            Move the crosshairs of all plots to the offset under the mouse and show
+            the offset and the values of series at it in the status bar.
+        '''
+        plotWidget = self.PlotWidgets[name]
+        if not plotWidget.sceneBoundingRect().contains(pos):
+            return
+
+        x = plotWidget.getViewBox().mapSceneToView(pos).x()
+        for crosshair in self.Crosshairs.values():
+            crosshair.setPos(x)
+
+        offset = int(round(x))
+        # bytes by the format of the loaded values, not the configs changed since
+        texts = ['offset: %d' % offset]
+        if self.DataFormat is not None:
+            texts[0] += ' (byte 0x%X)' % (self.DataFormat.Offset + max(offset, 0) * self.DataFormat.step())
+        for n in self.PlotNames:
+            pyramid = self.Pyramids[n]
+            if pyramid is None:
+                continue
+            idx = int(round(x / pyramid.XStep))
+            if 0 <= idx < len(pyramid):
+                val = pyramid.Vals[idx]
+                texts.append(('%s: %.6g' if pyramid.Vals.dtype.kind == 'f' else '%s: %d') % (n, val))
+
+        # differences of compared files at the offset
+        for i, cmp in enumerate(self.Comparisons):
+            diff = cmp['result']['diff']
+            if 0 <= offset < len(diff):
+                texts.append(('diff%d: %.6g' if diff.dtype.kind == 'f' else 'diff%d: %d') % (i + 1, diff[offset]))
+        self.CursorLabel.setText('    '.join(texts))
+
+
+
+    def add_search_panel(self):
+        '''
+            Add the search panel in a floating dock, which is shown by the search
+            menu. Searching runs in a background worker and clicking a hit jumps
+            the plots to it.
+        '''
+        self.SearchPanel = SearchPanel(self)
+        self.SearchPanel.SearchRequested.connect(self.start_search)
+        self.SearchPanel.HitActivated.connect(self.jump_to)
+        self.SearchWorker = None
+        self.SearchIndex = None         # (values, ByteIndex) of the last byte search
+
+        dock = widgets.QDockWidget('Search', self)
+        dock.setWidget(self.SearchPanel)
+        self.addDockWidget(core.Qt.RightDockWidgetArea, dock)
+        dock.setFloating(True)
+        dock.setVisible(False)
+
+        searchMenu = self.menuBar().addMenu('&Search')
+        searchMenu.addAction(dock.toggleViewAction())
+
+
+
+    def start_search(self, mode, text):
+        '''
+            Parse the query and search the values in a background worker, the search
+            running is cancelled.
+        '''
+        from search import parse_bytes, find_range, find_crossings, find_bytes, ByteIndex
+
+        vals = self.Datas.get('Value') if self.Datas else None
+        if vals is None:
+            return
+        limit = self.Cfg.SearchLimit
+
+        try:
+            if mode.startswith('bytes'):
+                pattern = parse_bytes(text)
+                index = self.SearchIndex[1] if self.SearchIndex and self.SearchIndex[0] is vals else None
+                indexable = vals.nbytes <= self.Cfg.SearchIndexLimit * 1024 * 1024
+
+                def job(progress, cancelled):
+                    # the index is built once for repeated searches on the values
+                    idx = index or (ByteIndex(vals) if indexable else None)
+                    hits = idx.find(pattern, limit) if idx else find_bytes(vals, pattern, limit)
+                    return hits, idx
+
+            else:
+                nums = [float(t) for t in text.replace(',', ' ').split()]
+                if mode == 'value range' and len(nums) == 2:
+                    job = lambda progress, cancelled: (find_range(vals, min(nums), max(nums), limit), None)
+                elif mode.startswith('crossing') and len(nums) == 1:
+                    upward = mode == 'crossing up'
+                    job = lambda progress, cancelled: (find_crossings(vals, nums[0], upward, limit), None)
+                else:
+                    raise ValueError('无法解析的查询')
+
+        except ValueError as exc:
+            self.SearchPanel.set_status(str(exc) if mode.startswith('bytes') else '无法解析的查询')
+            return
+
+        if self.SearchWorker is not None:
+            self.SearchWorker.cancel()
+        self.SearchWorker = Worker(job)
+        self.SearchWorker.Signals.Finished.connect(lambda result: self.search_finished(vals, result))
+        self.SearchWorker.Signals.Failed.connect(self.SearchPanel.set_status)
+        self.SearchPanel.set_status('searching...')
+        self.SearchWorker.start()
+
+
+
+    def search_finished(self, vals, result):
+        hits, index = result
+        if index is not None:
+            self.SearchIndex = (vals, index)
+        self.SearchPanel.set_hits(hits, self.Cfg.SearchLimit)
+
+
+
+    def jump_to(self, offset):
+        '''
+            Center the plots on the offset keeping the current span of view, the
+            crosshairs are moved to the offset.
+        '''
+        for name in self.PlotNames:
+            viewBox = self.PlotWidgets[name].getViewBox()
+            x0, x1 = viewBox.viewRange()[0]
+            span = max(min(x1 - x0, self.Cfg.JumpSpan), 10)
+            viewBox.setXRange(offset - span / 2, offset + span / 2, padding=0)
+            # linked plots follow the first one
+            if self.Cfg.LinkXAxes:
+                break
+        for crosshair in self.Crosshairs.values():
+            crosshair.setPos(offset)
+
+
+
+    def add_spectrum_panel(self):
+        '''
+            Add the spectrum panel in a floating dock, which is shown by the view
+            menu. The spectrum is computed in a background worker when the panel
+            is shown, and shown progressively.
+        '''
+        self.SpectrumPanel = SpectrumPanel(self)
+        self.SpectrumPanel.OffsetActivated.connect(self.jump_to)
+
+        self.SpectrumDock = widgets.QDockWidget('Spectrum', self)
+        self.SpectrumDock.setWidget(self.SpectrumPanel)
+        self.addDockWidget(core.Qt.RightDockWidgetArea, self.SpectrumDock)
+        self.SpectrumDock.setFloating(True)
+        self.SpectrumDock.setVisible(False)
+        self.SpectrumDock.visibilityChanged.connect(lambda shown: shown and self.start_spectrum(False))
+        self.ViewMenu.addAction(self.SpectrumDock.toggleViewAction())
+
+
+
+    def start_spectrum(self, force=True):
+        '''
+            Compute the spectrum of values in a background worker, the computing
+            one is cancelled. Unless forced, the values whose spectrum is shown
+            are not computed again.
+        '''
+        from spectral import iter_spectrogram
+
+        vals = self.Datas.get('Value') if self.Datas else None
+        if vals is None or (not force and vals is self.SpectrumVals):
+            return
+        window, hop = self.Cfg.SpectrumWindow, self.Cfg.SpectrumHop
+        rows, windowName = self.Cfg.SpectrogramRows, self.Cfg.SpectrumWindowFunc
+
+        def job(progress, cancelled):
+            spec = None
+            for spec in iter_spectrogram(vals, window, hop, rows, windowName):
+                if cancelled():
+                    return None
+                result = spec.result()
+                progress(int(100 * result['done']))
+                worker.publish(result)
+            return spec.result()
+
+        if self.SpectrumWorker is not None:
+            self.SpectrumWorker.cancel()
+        worker = self.SpectrumWorker = Worker(job)
+        worker.Signals.Partial.connect(self.SpectrumPanel.set_result)
+        worker.Signals.Finished.connect(self.SpectrumPanel.set_result)
+        worker.Signals.Failed.connect(self.SpectrumPanel.set_status)
+        self.SpectrumVals = vals
+        self.SpectrumPanel.set_status('computing...')
+        worker.start()
+
+
+
+    def add_histogram_panel(self):
+        '''
+            Add the panel of byte histograms of the sliding windows in a floating
+            dock, which is shown by the view menu. The histograms are computed in
+            a background worker when the panel is shown, and shown progressively.
+        '''
+        self.HistogramPanel = HistogramPanel(self)
+        self.HistogramPanel.OffsetActivated.connect(self.jump_to)
+
+        self.HistogramDock = widgets.QDockWidget('Byte histogram', self)
+        self.HistogramDock.setWidget(self.HistogramPanel)
+        self.addDockWidget(core.Qt.RightDockWidgetArea, self.HistogramDock)
+        self.HistogramDock.setFloating(True)
+        self.HistogramDock.setVisible(False)
+        self.HistogramDock.visibilityChanged.connect(lambda shown: shown and self.start_histogram(False))
+        self.ViewMenu.addAction(self.HistogramDock.toggleViewAction())
+
+
+
+    def start_histogram(self, force=True):
+        '''
+            Compute the byte histograms of the sliding windows of values in a
+            background worker, the computing one is cancelled. Unless forced, the
+            values whose histograms are shown are not computed again.
+        '''
+        from slidingStats import iter_histogram_image
+
+        vals = self.Datas.get('Value') if self.Datas else None
+        if vals is None or (not force and vals is self.HistogramVals):
+            return
+        window, step, rows = self.Cfg.StatsWindow, self.Cfg.StatsStep, self.Cfg.HistogramRows
+
+        def job(progress, cancelled):
+            image, percent = None, -1
+            for image in iter_histogram_image(vals, window, step, rows):
+                if cancelled():
+                    return None
+                # the image is published once per percent
+                result = image.result()
+                if int(100 * result['done']) > percent:
+                    percent = int(100 * result['done'])
+                    progress(percent)
+                    worker.publish(result)
+            return image.result()
+
+        if self.HistogramWorker is not None:
+            self.HistogramWorker.cancel()
+        worker = self.HistogramWorker = Worker(job)
+        worker.Signals.Partial.connect(self.HistogramPanel.set_result)
+        worker.Signals.Finished.connect(self.HistogramPanel.set_result)
+        worker.Signals.Failed.connect(self.HistogramPanel.set_status)
+        self.HistogramVals = vals
+        self.HistogramPanel.set_status('computing...')
+        worker.start()
+
+
+
+    def add_overview_panel(self):
+        '''
+            Add the overview panel in a floating dock, which is shown by the view
+            menu. The image is built in a background worker when the panel is
+            shown, and clicking a pixel jumps the plots to it.
+        '''
+        self.OverviewPanel = OverviewPanel(self.Cfg.OverviewHilbert, self)
+        self.OverviewPanel.OffsetActivated.connect(self.jump_to)
+        self.OverviewPanel.LayoutChanged.connect(lambda hilbert: self.Cfg.set('OverviewHilbert', hilbert))
+
+        self.OverviewDock = widgets.QDockWidget('Overview', self)
+        self.OverviewDock.setWidget(self.OverviewPanel)
+        self.addDockWidget(core.Qt.RightDockWidgetArea, self.OverviewDock)
+        self.OverviewDock.setFloating(True)
+        self.OverviewDock.setVisible(False)
+        self.OverviewDock.visibilityChanged.connect(lambda shown: shown and self.start_overview(False))
+        self.ViewMenu.addAction(self.OverviewDock.toggleViewAction())
+
+
+
+    def start_overview(self, force=True):
+        '''
+            Build the overview image of values in a background worker, the building
+            one is cancelled. Unless forced, the values whose overview is shown are
+            not built again.
+        '''
+        from overview import Overview
+
+        vals = self.Datas.get('Value') if self.Datas else None
+        if vals is None or (not force and vals is self.OverviewVals):
+            return
+        width, pixels = self.Cfg.OverviewWidth, self.Cfg.OverviewPixels
+        hilbert = self.OverviewPanel.HilbertBox.isChecked()
+
+        if self.OverviewWorker is not None:
+            self.OverviewWorker.cancel()
+        self.OverviewWorker = Worker(lambda progress, cancelled: Overview(vals, width, pixels, hilbert))
+        self.OverviewWorker.Signals.Finished.connect(self.OverviewPanel.set_overview)
+        self.OverviewWorker.Signals.Failed.connect(self.OverviewPanel.set_status)
+        self.OverviewVals = vals
+        self.OverviewPanel.set_status('building...')
+        self.OverviewWorker.start()
+
+
+
+    def add_region_panel(self):
+        '''
+            Add the region panel in a floating dock, which is shown by the view
+            menu. A region is shown on every plot with the panel, dragging any of
+            them moves the others and shows the statistics of the selected range.
+            The tables of statistics are built in a background worker.
+        '''
+        self.RegionPanel = RegionPanel(self)
+
+        self.RegionDock = widgets.QDockWidget('Region', self)
+        self.RegionDock.setWidget(self.RegionPanel)
+        self.addDockWidget(core.Qt.RightDockWidgetArea, self.RegionDock)
+        self.RegionDock.setFloating(True)
+        self.RegionDock.setVisible(False)
+        self.RegionDock.visibilityChanged.connect(self.show_regions)
+        self.ViewMenu.addAction(self.RegionDock.toggleViewAction())
+
+
+
+    def show_regions(self, shown):
+        '''
+            Show or hide the regions, a region shown at the first time selects the
+            middle tenth of the view.
+        '''
+        if shown and not self.RegionPlaced:
+            self.RegionPlaced = True
+            x0, x1 = self.PlotWidgets[self.PlotNames[0]].getViewBox().viewRange()[0]
+            self.Regions[self.PlotNames[0]].setRegion(((x0 * 11 + x1 * 9) / 20, (x0 * 9 + x1 * 11) / 20))
+        for region in self.Regions.values():
+            region.setVisible(shown)
+        if shown:
+            self.start_region_stats(False)
+
+
+
+    def start_region_stats(self, force=True):
+        '''
+            Build the tables of region statistics of values in a background worker,
+            the building one is cancelled. Unless forced, the values whose tables
+            are built are not built again.
+        '''
+        from regionStats import RegionStats
+
+        vals = self.Datas.get('Value') if self.Datas else None
+        if vals is None or (not force and vals is self.RegionVals):
+            return
+        block = self.Cfg.RegionBlock
+
+        def job(progress, cancelled):
+            stats = RegionStats(vals, block, progress, cancelled)
+            return None if stats.Cancelled else stats
+
+        if self.RegionWorker is not None:
+            self.RegionWorker.cancel()
+        self.RegionWorker = Worker(job)
+        self.RegionWorker.Signals.Progress.connect(lambda p: self.RegionPanel.set_status('building... %d%%' % p))
+        self.RegionWorker.Signals.Finished.connect(self.region_stats_built)
+        self.RegionWorker.Signals.Failed.connect(self.RegionPanel.set_status)
+        self.RegionVals = vals
+        self.RegionStats = None
+        self.RegionPanel.set_status('building...')
+        self.RegionWorker.start()
+
+
+
+    def region_stats_built(self, stats):
+        if stats is None:
+            return
+        self.RegionStats = stats
+        self.update_region_stats()
+
+
+
+    def region_changed(self, name):
+        '''
+            Move the other regions to the dragged one and show the statistics.
+        '''
+        if self.RegionSyncing:
+            return
+        bounds = self.Regions[name].getRegion()
+        self.RegionSyncing = True
+        try:
+            for region in self.Regions.values():
+                if region.getRegion() != bounds:
+                    region.setRegion(bounds)
+        finally:
+            self.RegionSyncing = False
+        self.update_region_stats()
+
+
+
+    @profiling.timed('region')
+    def update_region_stats(self):
+        '''
+            Query the statistics of the values whose offsets are in the region,
+            the query only scans the partial blocks at the ends of the range
+            (see "RegionStats") so that it follows the dragging.
+        '''
+        if self.RegionStats is None or not self.RegionDock.isVisible():
+            return
+        x0, x1 = self.Regions[self.PlotNames[0]].getRegion()
+        start, stop = int(np.ceil(x0)), int(np.floor(x1)) + 1
+        self.RegionPanel.set_stats(start, stop, self.RegionStats.query(start, stop))
+
+
+
+    def add_progress_bar(self):
+        '''
+            Add a progress bar to the status bar to show the progress of background
+            loading. The bar is hidden when nothing is being loaded. The readout of
+            crosshair is also in the status bar.
+        '''
+        self.CursorLabel = widgets.QLabel(self)
+        self.statusBar().addPermanentWidget(self.CursorLabel, 1)
+
+        self.ProgressBar = widgets.QProgressBar(self)
+        self.ProgressBar.setRange(0, 100)
+        self.ProgressBar.setVisible(False)
+        self.statusBar().addPermanentWidget(self.ProgressBar)
+
+
+
+    def add_profile_overlay(self):
+        '''
+            Add an overlay label of timings to the status bar and a View menu
+            toggling it. The label is refreshed by a timer only when shown.
+        '''
+        self.ProfileLabel = widgets.QLabel(self)
+        self.ProfileLabel.setVisible(False)
+        self.statusBar().addPermanentWidget(self.ProfileLabel)
+        self.ProfileTimer = core.QTimer(self)
+        self.ProfileTimer.timeout.connect(self.refresh_profile_overlay)
+
+        self.OverlayAction = widgets.QAction('&Performance overlay', self)
+        self.OverlayAction.setCheckable(True)
+        self.OverlayAction.toggled.connect(self.show_profile_overlay)
+        self.ViewMenu = self.menuBar().addMenu('&View')
+        self.ViewMenu.addAction(self.OverlayAction)
+        self.OverlayAction.setChecked(self.Cfg.ProfileOverlay)
+
+
+
+    def show_profile_overlay(self, shown):
+        self.Cfg.set('ProfileOverlay', shown)
+        self.ProfileLabel.setVisible(shown)
+        if shown:
+            self.refresh_profile_overlay()
+            self.ProfileTimer.start(OverlayInterval)
+        else:
+            self.ProfileTimer.stop()
+
+    def refresh_profile_overlay(self):
+        self.ProfileLabel.setText(profiling.summary(OverlaySpans))
+
+
+
+    def show_progress(self, percent, message='Loading...'):
+        '''
+            Slot to show the loading progress, None hides the progress bar.
+        '''
+        if percent is None:
+            self.ProgressBar.setVisible(False)
+            self.statusBar().clearMessage()
+        else:
+            self.ProgressBar.setVisible(True)
+            self.ProgressBar.setValue(percent)
+            self.statusBar().showMessage(message)
 
 
 
@@ -348,49 +1089,201 @@ class MainWindow(widgets.QMainWindow):
                                                      self.VisiblePlotCnt)
 
         # resize the plot size after the size changing
+        self.resize_plots()
+        self.Cfg.set(label + 'Visible', s == core.Qt.Checked)
+
+        # redraw the plot skipped when hidden
+        if label in self.StalePlots:
+            self.update_plot_view(label, self.StalePlots[label])
+        widgets.QApplication.processEvents()
+
+
+
+    @profiling.timed('resize')
+    def resize_plots(self):
+        '''
+            Share the plot area among the visible plots, the area is "PlotSlots"
+            plots of "PlotHeight".
+        '''
         resize_plots_adaptively(self.PlotWidgets.values(),
-                                len(self.PlotWidgets.values()),
+                                self.Cfg.PlotSlots,
                                 self.VisiblePlotCnt,
-                                self.Cfg['PlotWidth'],
-                                self.Cfg['PlotHeight'])
-        widgets.QApplication.processEvents()
+                                self.Cfg.PlotWidth,
+                                self.Cfg.PlotHeight)
 
 
 
-    def load_datas(self, plotDatas):
+    @profiling.timed('load_datas')
+    def load_datas(self, plotDatas, pyramids=None, fmt=None):
         '''
             Load datas from "Engine" to plot, fill the datas to corresponding
             PlotItem.
 
-            If this method is called when a file has already been loaded, it
-            will not construct new PlotItems and only update data in them.
+            Datas are not given to PlotItems directly, a min/max pyramid is built
+            for each of them and only the points fitting the view range and the
+            pixel width are drawn. Points are re-queried when the x range of the
+            view changes. Pyramids built by caller (in a background worker) can be
+            offered by "pyramids". "fmt" is the WordFormat the values are read
+            by, which maps the offsets to the bytes of file.
 
-            First loading will use configs to plot.
+            PlotItems are constructed with the plot widgets, this method only
+            updates data in them.
         '''
 
         for name in plotDatas.keys():
-            length = len(plotDatas[name])
-            x = np.linspace(0, length, length)
+            if pyramids is not None:
+                self.Pyramids[name] = pyramids[name]
+            else:
+                self.Pyramids[name] = MinMaxPyramid(plotDatas[name])
+
+            # comparisons are made against the former datas
+            if name == self.PlotNames[0]:
+                self.set_comparisons([], refresh=False)
+
+            # show the whole sequence for the new datas
+            self.PlotWidgets[name].enableAutoRange()
+            self.update_plot_view(name, fullRange=True)
+
+        self.Datas = plotDatas
+        self.DataFormat = fmt
+        self.show_progress(None)
 
-            if self.PlotItems[name] is None:
-                plotItem = pg.PlotDataItem(x, plotDatas[name], symbol=self.Cfg['Marker'])
-                plotItem.setSymbolBrush(pg.mkBrush(color=self.Cfg['MarkerColor']))
+        # spectrum and overview of the former datas are out of date
+        if self.SpectrumDock is not None and self.SpectrumDock.isVisible():
+            self.start_spectrum()
+        if self.HistogramDock is not None and self.HistogramDock.isVisible():
+            self.start_histogram()
+        if self.OverviewDock is not None and self.OverviewDock.isVisible():
+            self.start_overview()
+        if self.RegionDock is not None and self.RegionDock.isVisible():
+            self.start_region_stats()
 
-                self.PlotItems[name] = plotItem
-                self.PlotWidgets[name].addItem(self.PlotItems[name])
 
-                # init the visibility based on config
-                self.PlotWidgets[name].setVisible(self.Cfg[name+"Visible"])
-                self.PlotLabels[name].setVisible(self.Cfg[name+'Visible'])
 
-            # already exists PlotItem, only update the data in it
+    def update_datas(self, plotDatas, starts, stops=None):
+        '''
+            Incrementally update the datas of plots, only the changed ranges are
+            processed. "starts" gives the first changed index of each plot and
+            "stops" gives the end of changed range (exclusive), if "stops" is None
+            the datas are changed or appended from the starts to the ends.
+
+            Plots are redrawn only when they are visible and the changed range
+            is in view (or the view follows the datas by auto range).
+        '''
+        for name in plotDatas.keys():
+            pyramid = self.Pyramids[name]
+            stop = None if stops is None else stops[name]
+            if pyramid is None:
+                self.Pyramids[name] = pyramid = MinMaxPyramid(plotDatas[name])
             else:
-                self.PlotItems[name].setData(x, plotDatas[name])
+                pyramid.refresh(plotDatas[name], starts[name], stop)
+
+            viewBox = self.PlotWidgets[name].getViewBox()
+            x1 = viewBox.viewRange()[0][1]
+            if starts[name] * pyramid.XStep <= x1 or viewBox.autoRangeEnabled()[0]:
+                self.update_plot_view(name)
+
+        self.Datas = plotDatas
 
+    @profiling.timed('view')
+    def update_plot_view(self, name, fullRange=False):
+        '''
+            Re-query the pyramid of a plot for its current view range and pixel
+            width and update the PlotItem. Markers are only drawn when raw values
+            are shown and the count of them is below "MarkerThreshold".
+
+            Hidden plots are not redrawn but marked as stale, and they are redrawn
+            when shown again.
+        '''
+        pyramid = self.Pyramids[name]
+        if pyramid is None:
+            return
 
+        if self.PlotWidgets[name].isHidden():
+            self.StalePlots[name] = self.StalePlots.get(name, False) or fullRange
+            return
+        self.StalePlots.pop(name, None)
 
+        viewBox = self.PlotWidgets[name].getViewBox()
+        if fullRange:
+            x0, x1 = pyramid.extent()
+        else:
+            x0, x1 = viewBox.viewRange()[0]
+        pixels = viewBox.width() or self.Cfg.PlotWidth
 
+        x, y, raw = pyramid.query(x0, x1, pixels)
+        plotItem = self.PlotItems[name]
+        plotItem.setData(x, y)
 
+        showMarker = self.MarkerFlags[name] and raw and len(x) <= self.Cfg.MarkerThreshold
+        symbol = self.Cfg.Marker if showMarker else None
+        if plotItem.opts['symbol'] != symbol:
+            plotItem.setSymbol(symbol)
 
+        if name == self.PlotNames[0]:
+            self.update_comparison_view(x0, x1, pixels)
 
 
+
+    def set_comparisons(self, comparisons, refresh=True):
+        '''
+            Overlay the compared files on the first plot and highlight the offsets
+            where they differ from the loaded file.
+            :param comparisons: list of (path, values, pyramid, result of
+                    comparison.compare_values), empty list to clear
+        '''
+        plotWidget = self.PlotWidgets[self.PlotNames[0]]
+        for cmp in self.Comparisons:
+            plotWidget.removeItem(cmp['item'])
+
+        self.Comparisons = []
+        for i, (path, vals, pyramid, result) in enumerate(comparisons):
+            item = pg.PlotDataItem(pen=pg.mkPen(color=pg.intColor(i, hues=max(len(comparisons), 3))))
+            item.setClipToView(self.Cfg.ClipToView)
+            plotWidget.addItem(item)
+            self.Comparisons.append({'path': path, 'pyramid': pyramid, 'item': item, 'result': result})
+
+        if comparisons:
+            starts = np.concatenate([cmp['result']['starts'] for cmp in self.Comparisons])
+            stops = np.concatenate([cmp['result']['stops'] for cmp in self.Comparisons])
+            self.MismatchRuns = union_runs(starts, stops)
+            mismatched = ', '.join('%s: %d' % (core.QFileInfo(cmp['path']).fileName(), cmp['result']['mismatched'])
+                                   for cmp in self.Comparisons)
+            self.statusBar().showMessage('mismatched values  ' + mismatched)
+        else:
+            self.MismatchRuns = None
+
+        if refresh:
+            self.update_plot_view(self.PlotNames[0])
+
+
+
+    def update_comparison_view(self, x0, x1, pixels):
+        '''
+            Re-query the pyramids of compared files for the view, and draw the
+            mismatch runs in view as regions. Runs closer than two pixels are
+            merged and at most "RegionLimit" regions are drawn.
+        '''
+        for cmp in self.Comparisons:
+            x, y, _ = cmp['pyramid'].query(x0, x1, pixels)
+            cmp['item'].setData(x, y)
+
+        visible = 0
+        if self.MismatchRuns is not None:
+            starts, stops = self.MismatchRuns
+            i0 = np.searchsorted(stops, x0, side='right')
+            i1 = np.searchsorted(starts, x1, side='left')
+            starts, stops = merge_runs(starts[i0:i1], stops[i0:i1], 2 * (x1 - x0) / pixels)
+            visible = min(len(starts), RegionLimit)
+
+            plotWidget = self.PlotWidgets[self.PlotNames[0]]
+            while len(self.MismatchRegions) < visible:
+                region = pg.LinearRegionItem(movable=False, brush=pg.mkBrush(255, 0, 0, 60))
+                plotWidget.addItem(region, ignoreBounds=True)
+                self.MismatchRegions.append(region)
+            for region, start, stop in zip(self.MismatchRegions, starts, stops):
+                region.setRegion((start - 0.5, stop - 0.5))
+
+        for i, region in enumerate(self.MismatchRegions):
+            region.setVisible(i < visible)
+
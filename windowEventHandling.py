@@ -9,13 +9,19 @@
     used to encapsulate the extern widget as the parameter
     when slot function is called without widget provided.
 
-    Any modifications will not be written back to configs.
+    Visibility of plots and markers and the word format are written
+    back to configs, the other modifications are not.
+
+    pyqtgraph is imported inside the handlers using it, so that
+    the file dialog can be shown before pyqtgraph is loaded.
 '''
 
 from PyQt5 import QtWidgets as widgets
 from PyQt5 import QtCore as core
 from PyQt5 import QtGui as gui
-import pyqtgraph as pg
+import os
+
+from components import WordFormatDialog
 
 
 def resize_plots_adaptively(plot_widgets, plot_total_cnt, plot_cnt, plot_w, plot_h):
@@ -25,13 +31,13 @@ def resize_plots_adaptively(plot_widgets, plot_total_cnt, plot_cnt, plot_w, plot
     Widget and size are offered so the modification can be done independently
     in this method.
     :param plot_widgets: all widgets
-    :param plot_total_cnt: total count of plots
+    :param plot_total_cnt: count of plots filling the plot area by preset height
     :param plot_cnt: count of visible plots
     :param plot_w: preset width
     :param plot_h: preset height
     '''
     if plot_cnt != 0:
-        plotHeight = plot_h * plot_total_cnt / plot_cnt
+        plotHeight = int(plot_h * plot_total_cnt / plot_cnt)
         for plot in plot_widgets:
             plot.resize(plot_w, plotHeight)
             plot.setFixedSize(plot_w, plotHeight)
@@ -90,6 +96,7 @@ def get_cuvColor_reset_handler(plotItem):
         MainWindow.
     '''
     def resetCurveColor(rgb):
+        import pyqtgraph as pg
         # pen is to paint curve
         pen = pg.mkPen(color=rgb)
         plotItem.setPen(pen)
@@ -104,23 +111,21 @@ def get_markerColor_reset_handler(plotItem):
         MainWindow.
     '''
     def resetMarkerColor(rgb):
+        import pyqtgraph as pg
         brush = pg.mkBrush(color=rgb)
         plotItem.setSymbolBrush(brush)
 
     return resetMarkerColor
 
-def get_marker_visible_handler(plotItem):
+def get_marker_visible_handler(cfg, name):
     '''
         Get the handler as slot to process event when marker visibility changes.
 
-        This contains the real processing logic which is separated from
-        MainWindow.
+        The visibility is written to the "<name>Marker" item of "cfg", and the
+        plot is refreshed by the listener of config changes.
     '''
     def set_marker_visibility(state):
-        if state == core.Qt.Checked:
-            plotItem.setSymbol('o')
-        else:
-            plotItem.setSymbol(None)
+        cfg.set(name + 'Marker', state == core.Qt.Checked)
     return set_marker_visibility
 
 def get_grid_visible_handler(plotWidget):
@@ -136,6 +141,47 @@ def get_grid_visible_handler(plotWidget):
     return set_grid_visibility
 
 
+def get_word_format_handler(window, cfg, processor):
+    '''
+        Get the handler as slot to process event when the word format is changed.
+
+        A dialog is shown to choose the format, the chosen format is written to
+        "cfg" and the processor is called without argument to reload the file.
+    '''
+    def showWordFormatDialog():
+        dialog = WordFormatDialog(window, cfg)
+        if dialog.exec_() == widgets.QDialog.Accepted:
+            for k, v in dialog.values().items():
+                cfg.set(k, v)
+            processor()
+    return showWordFormatDialog
+
+
+def get_open_files_handler(window, processor):
+    '''
+        Get the handler as slot to process event when several files are to be opened,
+        the processor is called with the list of chosen paths.
+    '''
+    def showFilesDialog():
+        fnames = widgets.QFileDialog.getOpenFileNames(window, 'Open files', '/')
+        return processor(fnames[0])
+    return showFilesDialog
+
+
+def get_save_file_handler(window, processor, filters):
+    '''
+        Get the handler as slot to choose the file to save, the processor is called
+        with the chosen path. The extension of the chosen filter is appended when
+        the path has none.
+    '''
+    def showSaveDialog():
+        fname, chosen = widgets.QFileDialog.getSaveFileName(window, 'Save file', '/', filters)
+        if fname and not os.path.splitext(fname)[1] and '*.' in chosen:
+            fname += chosen[chosen.index('*.') + 1:].split()[0].rstrip(')')
+        return processor(fname)
+    return showSaveDialog
+
+
 def get_open_file_handler(window, processor):
     '''
         Get the handler as slot to process event when the loading file is called.
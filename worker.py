@@ -0,0 +1,68 @@
+'''
+    @Author: TangZhiJie 唐郅杰 2017141463155
+
+    Background worker to run heavy jobs (loading and computing) off
+    the GUI thread, based on the global QThreadPool.
+
+    A job is a plain function which is called with the given arguments
+    and two keyword callbacks: "progress" to report the percent of the
+    work done and "cancelled" to ask whether the job should stop early.
+    Results and errors are handed back by signals, and the receivers
+    living in the GUI thread get them through queued connections.
+    Progressive jobs may hand back intermediate results by "publish".
+'''
+
+from PyQt5 import QtCore as core
+
+class WorkerSignals(core.QObject):
+    Progress = core.pyqtSignal(int)         # percent of the work done
+    Finished = core.pyqtSignal(object)      # result of the job
+    Failed = core.pyqtSignal(str)           # message of the error
+    Partial = core.pyqtSignal(object)       # intermediate result of the job
+
+class Worker(core.QRunnable):
+
+    def __init__(self, job, *args):
+        super(Worker, self).__init__()
+        self.Job = job
+        self.Args = args
+        self.Signals = WorkerSignals()
+        self.Cancelled = False
+
+    def cancel(self):
+        '''
+            Ask the job to stop, no more signals will be emitted once cancelled.
+        '''
+        self.Cancelled = True
+
+    def is_cancelled(self):
+        return self.Cancelled
+
+    def report(self, percent):
+        if not self.Cancelled:
+            self.Signals.Progress.emit(percent)
+
+    def publish(self, result):
+        if not self.Cancelled:
+            self.Signals.Partial.emit(result)
+
+    def start(self):
+        core.QThreadPool.globalInstance().start(self)
+
+    def run(self):
+        try:
+            result = self.Job(*self.Args, progress=self.report, cancelled=self.is_cancelled)
+
+        # failures expected by the job
+        except ValueError as exc:
+            if not self.Cancelled:
+                self.Signals.Failed.emit(str(exc))
+            return
+
+        except Exception:
+            if not self.Cancelled:
+                self.Signals.Failed.emit('遇到了意料之外的错误')
+            return
+
+        if not self.Cancelled:
+            self.Signals.Finished.emit(result)